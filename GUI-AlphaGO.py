@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*-
+import sys
 import tkinter as tk
 from UCT import *
-import time
-PIECE_SIZE = 20#子的大小
+from ponder import PonderingEngine
+from book import OpenBook
+## 棋盘大小: python GUI-AlphaGO.py 10
+BOARD_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+CELL = 455 // (BOARD_SIZE - 1)#格子间距, 8x8为65
+PIECE_SIZE = CELL * 4 // 13#子的大小
 
 click_x = 0
 click_y = 0
 
-pieces_x = [i for i in range(60, 60+65*7+1, 65)]
-pieces_y = [i for i in range(60, 60+65*7+1, 65)]
+pieces_x = [i for i in range(60, 60+CELL*(BOARD_SIZE-1)+1, CELL)]
+pieces_y = [i for i in range(60, 60+CELL*(BOARD_SIZE-1)+1, CELL)]
 
 coor_black = []
 coor_white = []
@@ -18,6 +23,16 @@ piece_color = "black"
 
 total_time=0
 
+## 每个格子固定一个棋子item和一个提示item，重绘时只改变化了的格子
+disc_items = {}  # (x,y) -> 棋子的canvas item
+hint_items = {}  # (x,y) -> 可落子提示的canvas item
+shown_board = {}  # (x,y) -> 当前画在界面上的 0/1/2
+shown_hints = set()  # 当前显示提示的格子
+HINT_SIZE = 6
+ai_thinking = False # ai在后台线程思考时忽略点击
+THINK_MS = 2000 # ai每步最多思考的毫秒数
+GAME_MS = 60000 # ai整局的总思考时间
+
 #右上方的棋子提示（工具）
 def showChange(color):
     global piece_color
@@ -51,9 +66,9 @@ def piecesCount(coor, pieces_count, t1, t2):
     return pieces_count
 
 def gui2board(x):
-    return int((x - 60) / 65)
+    return int(round((x - 60) / CELL))
 def board2gui(x):
-    return (7 - x) * 65 + 60
+    return (BOARD_SIZE - 1 - x) * CELL + 60
 # 事件监听处理
 def coorBack(event):  # return coordinates of cursor 返回光标坐标
     global click_x, click_y
@@ -69,48 +84,74 @@ def coorBack(event):  # return coordinates of cursor 返回光标坐标
             click_x=int(tags_tuple[0])
             click_y=int(tags_tuple[1])
             x=gui2board(click_x)
-            y=7-gui2board(click_y)
+            y=BOARD_SIZE-1-gui2board(click_y)
         except ValueError:
             print("piece!!!")
         else:
             print('go')
+            if ai_thinking or type(state) is float:
+                return
             if (x,y) in state.GetMoves():
                 state = UCTreceive(state=state,x=x,y=y)
+                engine.Play((x,y))
                 draw_state()
-                # ai没有棋可走
-                while state.GetMoves() == []:
-                    ## 换成人
-                    state.playerJustMoved = 3 - state.playerJustMoved
-                    ## 人没有棋可走
-                    if state.GetMoves() == []:
-                        state=state.GetResult(3-state.playerJustMoved)
-                        pushMessage()
-                    else:
-                        state = UCTreceive(state=state,x=x,y=y)
-                        draw_state()
-                time_start=time.time()
-                state = UCTaimove(state=state)
-                time_end=time.time()
-                per_time=time_end-time_start
-                total_time+=per_time
-
-                var1.set('step='+str(round(per_time,2))+'s')
-                var2.set('total='+str(round(total_time,2))+'s')
-                if type(state) is float:
-                    pushMessage()
-                else:
-                    draw_state()
-
-
-
+                nextTurn()
+
+
+# 一步走完后决定下一步：轮到ai则交给后台线程，没有棋可走则跳过，双方都没有则结束
+def nextTurn():
+    global state, ai_thinking
+    if not state.HasMoves():
+        state.playerJustMoved = 3 - state.playerJustMoved
+        if not state.HasMoves():
+            state = state.GetResult(1)
+            pushMessage()
+            return
+    if state.playerJustMoved == 1:
+        ## 轮到ai(白棋)
+        ai_thinking = True
+        engine.Think(state)
+
+
+# 用root.after轮询后台线程的结果，界面不会卡住
+def pollEngine():
+    global state, total_time, ai_thinking
+    result = engine.Poll()
+    if result is not None:
+        (move, info, hit) = result
+        ai_thinking = False
+        state.DoMove(move)
+        per_time=info.elapsed
+        total_time+=per_time
+
+        var1.set('step='+str(round(per_time,2))+'s\n'+str(info.iterations)+' iters'+(' (hit)' if hit else ''))
+        var2.set('total='+str(round(total_time,2))+'s')
+        draw_state()
+        nextTurn()
+    root.after(50, pollEngine)
+
+
+
+# 与上次画的棋盘比较，只改新落的子和被翻转的子，提示也只改有变化的格子
 def draw_state():
-    global state
-    for i in range(0, 8):
-        for j in range(0, 8):
-            if state.board[int(7 - j)][int(i)] == 1:
-                putPiece("black", click_x=board2gui(j), click_y=board2gui(i))
-            elif state.board[int(7 - j)][int(i)] == 2:
-                putPiece("white", click_x=board2gui(j), click_y=board2gui(i))
+    global state, shown_hints
+    board = state.board
+    for x in range(0, BOARD_SIZE):
+        for y in range(0, BOARD_SIZE):
+            if shown_board.get((x, y), 0) != board[x][y]:
+                if board[x][y] == 0:
+                    canvas.itemconfigure(disc_items[(x, y)], state=tk.HIDDEN)
+                else:
+                    canvas.itemconfigure(disc_items[(x, y)], state=tk.NORMAL,
+                                         fill="black" if board[x][y] == 1 else "white")
+                shown_board[(x, y)] = board[x][y]
+    ## 只在轮到人(黑棋)时提示可落子的位置
+    hints = set(state.GetMoves()) if state.playerJustMoved == 2 else set()
+    for sq in shown_hints - hints:
+        canvas.itemconfigure(hint_items[sq], state=tk.HIDDEN)
+    for sq in hints - shown_hints:
+        canvas.itemconfigure(hint_items[sq], state=tk.NORMAL)
+    shown_hints = hints
     print(str(state))
     print(state.GetMoves())
 
@@ -124,6 +165,10 @@ def gameReset():
     var2.set("")  # 还原游戏结束提示标签
     showChange("black")  # 还原棋子提示图片
     canvas.delete("piece")  # 删除所有棋子
+    canvas.itemconfigure("disc", state=tk.HIDDEN)  # 隐藏棋盘上的棋子和提示
+    canvas.itemconfigure("hint", state=tk.HIDDEN)
+    shown_board.clear()
+    shown_hints.clear()
     coor_black = []  # 清空黑棋坐标存储器
     coor_white = []  # 清空白棋坐标存储器
 
@@ -281,9 +326,9 @@ canvas = tk.Canvas(root, bg="saddlebrown", width=540, height=540)#画布大小
 canvas.bind("<Button-1>", coorBack)  # 鼠标单击事件绑定
 canvas.grid(row=0, column=0, rowspan=6)
 # 线条
-for i in range(8):
-    canvas.create_line(60, (65 * i + 60), 60+7*65, (65 * i + 60))
-    canvas.create_line((65 * i + 60), 60, (65 * i + 60), 60+7*65)
+for i in range(BOARD_SIZE):
+    canvas.create_line(60, (CELL * i + 60), 60+(BOARD_SIZE-1)*CELL, (CELL * i + 60))
+    canvas.create_line((CELL * i + 60), 60, (CELL * i + 60), 60+(BOARD_SIZE-1)*CELL)
 # 点
 # point_x = [3, 3, 11, 11, 7]
 # point_y = [3, 11, 3, 11, 7]
@@ -298,22 +343,40 @@ for i in pieces_x:
                            i + PIECE_SIZE, j + PIECE_SIZE,
                            width=0, tags=(str(i), str(j)))
 
+# 棋子和提示（初始隐藏，带坐标tag，点在上面也能定位到格子）
+for x in range(BOARD_SIZE):
+    for y in range(BOARD_SIZE):
+        (i, j) = (board2gui(BOARD_SIZE - 1 - x), board2gui(y))
+        disc_items[(x, y)] = canvas.create_oval(i - PIECE_SIZE, j - PIECE_SIZE,
+                                                i + PIECE_SIZE, j + PIECE_SIZE,
+                                                state=tk.HIDDEN, tags=(str(i), str(j), "disc"))
+        hint_items[(x, y)] = canvas.create_oval(i - HINT_SIZE, j - HINT_SIZE,
+                                                i + HINT_SIZE, j + HINT_SIZE,
+                                                outline="black", width=2,
+                                                state=tk.HIDDEN, tags=(str(i), str(j), "hint"))
+
 # 数字坐标
-for i in range(8):
+for i in range(BOARD_SIZE):
     label = tk.Label(canvas, text=str(i + 1), fg="black", bg="saddlebrown",
                      width=2, anchor=tk.E)
-    label.place(x=2, y=65 * i + 40)
+    label.place(x=2, y=CELL * i + 40)
 # 字母坐标
 count = 0
-for i in range(65, 81):
+for i in range(65, 65 + BOARD_SIZE):
     label = tk.Label(canvas, text=chr(i), fg="black", bg="saddlebrown")
-    label.place(x=65 * count + 47, y=2)
+    label.place(x=CELL * count + 47, y=2)
     count += 1
 
 """窗口循环"""
 ## 对state的init
-state = OthelloState()
+state = MakeState(BOARD_SIZE, engine="bitboard")
+## ai的搜索树在两步之间保留
+searcher = UCTSearcher(itermax=None, timeout=THINK_MS, clock=GameClock(GAME_MS), book=OpenBook()) # 有book.bin时开局查表
+## ai在后台线程搜索，人思考时继续推演(ponder)
+engine = PonderingEngine(searcher)
+engine.start()
 
 draw_state()
+root.after(50, pollEngine)
 
 root.mainloop()
\ No newline at end of file
@@ -1,6 +1,55 @@
 ﻿# -*- coding: utf-8 -*-
 from math import *
 import random
+import os
+import time
+import itertools
+from collections import OrderedDict
+
+_ZOBRIST = {}
+def ZobristKeys(sz):
+    """ Return (keys, side) for an sz*sz board: keys[p][x*sz+y] is the random 64-bit key of a
+        player-p counter on (x,y), side is xored in when player 2 is to move.
+        The keys are seeded by the board size, so hashes are the same in every process.
+    """
+    if sz not in _ZOBRIST:
+        r = random.Random(sz)
+        keys = [None] + [[r.getrandbits(64) for i in range(sz*sz)] for p in (1,2)]
+        _ZOBRIST[sz] = (keys, r.getrandbits(64))
+    return _ZOBRIST[sz]
+
+## 棋盘的8种对称: (x,y) -> 变换后的坐标, n = size-1
+SYMMETRIES = [lambda x, y, n: (x, y), lambda x, y, n: (n-x, y), lambda x, y, n: (x, n-y), lambda x, y, n: (n-x, n-y),
+              lambda x, y, n: (y, x), lambda x, y, n: (n-y, x), lambda x, y, n: (y, n-x), lambda x, y, n: (n-y, n-x)]
+INVERSE = [0, 1, 2, 3, 4, 6, 5, 7] # SYMMETRIES[INVERSE[k]] undoes SYMMETRIES[k]
+
+def Transform(move, k, sz):
+    """ The square move is mapped to by symmetry k of an sz*sz board.
+    """
+    return SYMMETRIES[k](move[0], move[1], sz - 1)
+
+_SQUARE_KEYS = {}
+def SquareKeys(sz):
+    """ keys[p][x*sz+y] = the Zobrist keys of a player-p counter on (x,y) in each of the 8
+        symmetric variants of the board, as a tuple.
+    """
+    if sz not in _SQUARE_KEYS:
+        keys = ZobristKeys(sz)[0]
+        _SQUARE_KEYS[sz] = [None] + [[tuple(keys[p][a*sz+b] for (a, b) in (f(x, y, sz - 1) for f in SYMMETRIES))
+                                      for x in range(sz) for y in range(sz)] for p in (1, 2)]
+    return _SQUARE_KEYS[sz]
+
+def SymmetryHashes(state, discs):
+    """ Hash() of the 8 symmetric variants of a position, given its discs as (player, square index) pairs.
+    """
+    keys = SquareKeys(state.size)
+    hashes = [0]*8
+    for (p, i) in discs:
+        hashes = [h ^ kk for (h, kk) in zip(hashes, keys[p][i])]
+    if state.playerJustMoved == 1:
+        side = ZobristKeys(state.size)[1]
+        hashes = [h ^ side for h in hashes]
+    return hashes
 
 class OthelloState:
     def __init__(self,sz = 8):
@@ -14,14 +63,28 @@ class OthelloState:
         self.board[int(sz/2-1)][int(sz/2-1)] = 1
         self.board[int(sz/2)][int(sz/2-1)] = 2
         self.board[int(sz/2-1)][int(sz/2)] = 2
+        self.undoStack = [] # (move, flipped counters, playerJustMoved before the move, squares added to the frontier)
+        keys = ZobristKeys(sz)[0]
+        self.zobrist = 0 # hash of the counters only, updated incrementally by DoMove
+        for x in range(sz):
+            for y in range(sz):
+                if self.board[x][y]:
+                    self.zobrist ^= keys[self.board[x][y]][x*sz+y]
+        ## 只有与棋子相邻的空格才可能是合法落子点
+        self.frontier = set((x,y) for x in range(sz) for y in range(sz) if self.board[x][y] == 0 and self.AdjacentToCounter(x,y))
+        self.moveCache = None # (playerJustMoved, legal moves), reset by DoMove/UndoMove
 
     def Clone(self):
-        """ Create a deep clone of this game state.
+        """ Create a deep clone of this game state. The clone starts with an empty undo stack.
         """
-        st = OthelloState()
+        st = OthelloState.__new__(OthelloState)
         st.playerJustMoved = self.playerJustMoved
         st.board = [self.board[i][:] for i in range(self.size)]
         st.size = self.size
+        st.undoStack = []
+        st.zobrist = self.zobrist
+        st.frontier = set(self.frontier)
+        st.moveCache = self.moveCache # never mutated in place, safe to share
         return st
 
     def DoMove(self, move):
@@ -31,15 +94,93 @@ class OthelloState:
         (x,y)=(move[0],move[1])
         assert x == int(x) and y == int(y) and self.IsOnBoard(x,y) and self.board[x][y] == 0
         m = self.GetAllSandwichedCounters(x,y)
+        self.frontier.discard((x,y))
+        added = [(x+dx,y+dy) for (dx,dy) in [(0,+1),(+1,+1),(+1,0),(+1,-1),(0,-1),(-1,-1),(-1,0),(-1,+1)]
+                 if self.IsOnBoard(x+dx,y+dy) and self.board[x+dx][y+dy] == 0 and (x+dx,y+dy) not in self.frontier]
+        self.frontier.update(added)
+        self.undoStack.append(((x,y), m, self.playerJustMoved, added))
+        self.moveCache = None
         self.playerJustMoved = 3 - self.playerJustMoved
         self.board[x][y] = self.playerJustMoved
+        self.UpdateZobrist(x, y, m, self.playerJustMoved)
         for (a,b) in m:
             self.board[a][b] = self.playerJustMoved
+
+    def UndoMove(self):
+        """ Take back the last move made with DoMove: empty its square, flip the
+            sandwiched counters back and restore playerJustMoved.
+        """
+        ((x,y), m, pjm, added) = self.undoStack.pop()
+        self.board[x][y] = 0
+        for (a,b) in m:
+            self.board[a][b] = pjm
+        self.frontier.difference_update(added)
+        self.frontier.add((x,y))
+        self.moveCache = None
+        self.playerJustMoved = pjm
+        self.UpdateZobrist(x, y, m, 3 - pjm)
+
+    def UpdateZobrist(self, x, y, flipped, p):
+        """ Xor player p's counter on (x,y) and the colour change of the flipped counters
+            into the hash. Applying it twice undoes it.
+        """
+        keys = ZobristKeys(self.size)[0]
+        sz = self.size
+        self.zobrist ^= keys[p][x*sz+y]
+        for (a,b) in flipped:
+            self.zobrist ^= keys[1][a*sz+b] ^ keys[2][a*sz+b]
+
+    def Hash(self):
+        """ 64-bit Zobrist hash of the position including the side to move.
+        """
+        return self.zobrist ^ ZobristKeys(self.size)[1] if self.playerJustMoved == 1 else self.zobrist
+
+    def SymmetryHashes(self):
+        """ Hash() of the position transformed by each of the 8 board symmetries (see SYMMETRIES).
+        """
+        sz = self.size
+        return SymmetryHashes(self, [(p, x*sz+y) for x in range(sz) for (y, p) in enumerate(self.board[x]) if p])
+
+    def CanonicalHash(self):
+        """ (hash, k): the smallest hash over the 8 symmetric variants, equal for all positions that
+            are rotations or reflections of each other, and the symmetry k that produces it.
+        """
+        hashes = self.SymmetryHashes()
+        h = min(hashes)
+        return (h, hashes.index(h))
     
     def GetMoves(self):
         """ Get all possible moves from this state.
         """
-        return [(x,y) for x in range(self.size) for y in range(self.size) if self.board[x][y] == 0 and self.ExistsSandwichedCounter(x,y)]
+        return self._Moves()[:]
+
+    def _Moves(self):
+        """ The cached legal moves, sorted as GetMoves; callers must not modify the list.
+            Only the frontier squares are tried.
+        """
+        if self.moveCache is None or self.moveCache[0] != self.playerJustMoved: # a pass also changes the side to move
+            moves = [(x,y) for (x,y) in self.frontier if self.ExistsSandwichedCounter(x,y)]
+            moves.sort()
+            self.moveCache = (self.playerJustMoved, moves)
+        return self.moveCache[1]
+
+    def HasMoves(self):
+        """ Can the player to move make a move? Cheaper than comparing GetMoves() with [].
+        """
+        return self._Moves() != []
+
+    def GetRandomMove(self):
+        """ A uniformly random legal move, without copying the move list. Raises IndexError if there is none.
+        """
+        return random.choice(self._Moves())
+
+    def AdjacentToCounter(self,x,y):
+        """ Is (x,y) next to a counter of either player, i.e. on the frontier if empty?
+        """
+        for (dx,dy) in [(0,+1),(+1,+1),(+1,0),(+1,-1),(0,-1),(-1,-1),(-1,0),(-1,+1)]:
+            if self.IsOnBoard(x+dx,y+dy) and self.board[x+dx][y+dy] != 0:
+                return True
+        return False
 
     def AdjacentToEnemy(self,x,y):
         """ Speeds up GetMoves by only considering squares which are adjacent to an enemy-occupied square.
@@ -91,6 +232,11 @@ class OthelloState:
 
     def IsOnBoard(self, x, y):
         return x >= 0 and x < self.size and y >= 0 and y < self.size
+
+    def Empties(self):
+        """ Number of empty squares.
+        """
+        return sum(row.count(0) for row in self.board)
     
     def GetResult(self, playerjm):
         """ Get the game result from the viewpoint of playerjm. 
@@ -109,10 +255,282 @@ class OthelloState:
             s += "\n"
         return s
 
+try:
+    _popcount = int.bit_count
+except AttributeError: # python < 3.10
+    def _popcount(b):
+        return bin(b).count("1")
+
+_GEOMETRY = {}
+def BitboardGeometry(sz):
+    """ Return (full, dirs) for an sz*sz bitboard, where square (x,y) is bit x*sz+y.
+        dirs is a list of (shift, mask) pairs, one per direction; the mask clears the
+        bits that wrapped around a board edge after shifting.
+    """
+    if sz not in _GEOMETRY:
+        full = (1 << (sz*sz)) - 1
+        col0 = sum(1 << (x*sz) for x in range(sz)) # all squares with y == 0
+        colN = col0 << (sz-1)                        # all squares with y == sz-1
+        dirs = []
+        for (dx,dy) in [(0,+1),(+1,+1),(+1,0),(+1,-1),(0,-1),(-1,-1),(-1,0),(-1,+1)]:
+            mask = full
+            if dy == +1: mask &= ~col0
+            if dy == -1: mask &= ~colN
+            dirs.append((dx*sz + dy, mask))
+        _GEOMETRY[sz] = (full, dirs)
+    return _GEOMETRY[sz]
+
+def BitMoves(own, opp, sz):
+    """ Bitmask of the legal moves of the side owning `own` against `opp` on an sz*sz board.
+    """
+    full, dirs = BitboardGeometry(sz)
+    empty = ~(own | opp) & full
+    moves = 0
+    for (s,mask) in dirs:
+        if s > 0:
+            t = (own << s) & mask & opp
+            while t:
+                moves |= (t << s) & mask & empty
+                t = (t << s) & mask & opp
+        else:
+            t = (own >> -s) & mask & opp
+            while t:
+                moves |= (t >> -s) & mask & empty
+                t = (t >> -s) & mask & opp
+    return moves
+
+def BitFlips(own, opp, m, sz):
+    """ Bitmask of the `opp` discs flipped when the side owning `own` plays the single-bit move m.
+    """
+    flips = 0
+    for (s,mask) in BitboardGeometry(sz)[1]:
+        f = 0
+        b = ((m << s) if s > 0 else (m >> -s)) & mask
+        while b & opp:
+            f |= b
+            b = ((b << s) if s > 0 else (b >> -s)) & mask
+        if b & own:
+            flips |= f
+    return flips
+
+def BoardBits(board, sz):
+    """ [0, player 1 bits, player 2 bits] of a list-of-lists position, board[x][y] in {0,1,2}.
+    """
+    bits = [0, 0, 0]
+    for x in range(sz):
+        for y in range(sz):
+            if board[x][y]:
+                bits[board[x][y]] |= 1 << (x*sz+y)
+    return bits
+
+def StateBits(state):
+    """ (player 1 bits, player 2 bits) of an OthelloState or BitboardState.
+    """
+    if hasattr(state, "bits"):
+        return state.bits[1], state.bits[2]
+    bits = BoardBits(state.board, state.size)
+    return bits[1], bits[2]
+
+class BitboardState:
+    """ Drop-in replacement for OthelloState keeping the position in two integers,
+        one bit per square for each player. Move generation and flips are computed
+        with shifts and masks over the whole board at once.
+    """
+    def __init__(self,sz = 8):
+        self.playerJustMoved = 2 # player-1 has the first move
+        self.size = sz
+        assert sz == int(sz) and sz % 2 == 0 # size must be integral and even
+        h = sz//2
+        self.bits = [0, 0, 0] # bits[p] = discs of player p, bits[0] unused
+        self.bits[1] = (1 << (h*sz+h)) | (1 << ((h-1)*sz+h-1))
+        self.bits[2] = (1 << (h*sz+h-1)) | (1 << ((h-1)*sz+h))
+        self.undoStack = [] # (move bit, flipped bits, playerJustMoved before the move)
+        self.zobrist = self.BoardZobrist()
+        self.moveCache = None # (playerJustMoved, legal moves), reset by DoMove/UndoMove
+
+    def Clone(self):
+        """ Create a deep clone of this game state. The clone starts with an empty undo stack.
+        """
+        st = BitboardState.__new__(BitboardState)
+        st.playerJustMoved = self.playerJustMoved
+        st.size = self.size
+        st.bits = self.bits[:]
+        st.undoStack = []
+        st.zobrist = self.zobrist
+        st.moveCache = self.moveCache # never mutated in place, safe to share
+        return st
+
+    @property
+    def board(self):
+        """ The position as a list-of-lists, board[x][y] in {0,1,2}, as in OthelloState.
+            This is a fresh copy: assigning into it does not change the state.
+        """
+        sz = self.size
+        b1, b2 = self.bits[1], self.bits[2]
+        return [[1 if (b1 >> (x*sz+y)) & 1 else 2 if (b2 >> (x*sz+y)) & 1 else 0 for y in range(sz)] for x in range(sz)]
+
+    @board.setter
+    def board(self, board):
+        self.bits = BoardBits(board, self.size)
+        self.zobrist = self.BoardZobrist()
+        self.moveCache = None
+
+    def BoardZobrist(self):
+        """ Zobrist hash of the counters computed from scratch (same keys as OthelloState).
+        """
+        keys = ZobristKeys(self.size)[0]
+        z = 0
+        for p in (1,2):
+            b = self.bits[p]
+            while b:
+                low = b & -b
+                z ^= keys[p][low.bit_length() - 1]
+                b ^= low
+        return z
+
+    def UpdateZobrist(self, m, f, p):
+        """ Xor player p's counter on move bit m and the colour change of the flipped bits f
+            into the hash. Applying it twice undoes it.
+        """
+        keys = ZobristKeys(self.size)[0]
+        z = self.zobrist ^ keys[p][m.bit_length() - 1]
+        while f:
+            low = f & -f
+            i = low.bit_length() - 1
+            z ^= keys[1][i] ^ keys[2][i]
+            f ^= low
+        self.zobrist = z
+
+    def Hash(self):
+        """ 64-bit Zobrist hash of the position including the side to move.
+        """
+        return self.zobrist ^ ZobristKeys(self.size)[1] if self.playerJustMoved == 1 else self.zobrist
+
+    def SymmetryHashes(self):
+        """ Hash() of the position transformed by each of the 8 board symmetries (see SYMMETRIES).
+        """
+        discs = []
+        for p in (1,2):
+            b = self.bits[p]
+            while b:
+                low = b & -b
+                discs.append((p, low.bit_length() - 1))
+                b ^= low
+        return SymmetryHashes(self, discs)
+
+    def CanonicalHash(self):
+        """ (hash, k): the smallest hash over the 8 symmetric variants and the symmetry k that produces it.
+        """
+        hashes = self.SymmetryHashes()
+        h = min(hashes)
+        return (h, hashes.index(h))
+
+    def Flips(self, x, y):
+        """ Bitmask of the discs flipped if the player to move placed a counter at (x,y).
+        """
+        return BitFlips(self.bits[3 - self.playerJustMoved], self.bits[self.playerJustMoved], 1 << (x*self.size+y), self.size)
+
+    def DoMove(self, move):
+        """ Update a state by carrying out the given move.
+            Must update playerToMove.
+        """
+        (x,y)=(move[0],move[1])
+        m = 1 << (x*self.size+y)
+        assert self.IsOnBoard(x,y) and not (self.bits[1] | self.bits[2]) & m
+        f = self.Flips(x,y)
+        self.undoStack.append((m, f, self.playerJustMoved))
+        p = 3 - self.playerJustMoved
+        self.bits[p] |= f | m
+        self.bits[3 - p] &= ~f
+        self.playerJustMoved = p
+        self.moveCache = None
+        self.UpdateZobrist(m, f, p)
+
+    def UndoMove(self):
+        """ Take back the last move made with DoMove.
+        """
+        (m, f, pjm) = self.undoStack.pop()
+        self.bits[3 - pjm] &= ~(f | m)
+        self.bits[pjm] |= f
+        self.playerJustMoved = pjm
+        self.moveCache = None
+        self.UpdateZobrist(m, f, 3 - pjm)
+
+    def MoveMask(self):
+        """ Bitmask of all legal moves for the player to move.
+        """
+        return BitMoves(self.bits[3 - self.playerJustMoved], self.bits[self.playerJustMoved], self.size)
+
+    def GetMoves(self):
+        """ Get all possible moves from this state, in the same order as OthelloState.GetMoves.
+        """
+        return self._Moves()[:]
+
+    def _Moves(self):
+        """ The cached legal moves; callers must not modify the list.
+        """
+        if self.moveCache is None or self.moveCache[0] != self.playerJustMoved: # a pass also changes the side to move
+            moves = self.MoveMask()
+            sz = self.size
+            out = []
+            while moves:
+                low = moves & -moves
+                out.append(divmod(low.bit_length() - 1, sz))
+                moves ^= low
+            self.moveCache = (self.playerJustMoved, out)
+        return self.moveCache[1]
+
+    def HasMoves(self):
+        """ Can the player to move make a move? Cheaper than comparing GetMoves() with [].
+        """
+        return self._Moves() != []
+
+    def GetRandomMove(self):
+        """ A uniformly random legal move, without copying the move list. Raises IndexError if there is none.
+        """
+        return random.choice(self._Moves())
+
+    def IsOnBoard(self, x, y):
+        return x >= 0 and x < self.size and y >= 0 and y < self.size
+
+    def Empties(self):
+        """ Number of empty squares.
+        """
+        return self.size*self.size - _popcount(self.bits[1] | self.bits[2])
+
+    def GetResult(self, playerjm):
+        """ Get the game result from the viewpoint of playerjm.
+        """
+        jmcount = _popcount(self.bits[playerjm])
+        notjmcount = _popcount(self.bits[3 - playerjm])
+        if jmcount > notjmcount: return 1.0
+        elif notjmcount > jmcount: return 0.0
+        else: return 0.5 # draw
+
+    def __repr__(self):
+        s= ""
+        sz = self.size
+        b1, b2 = self.bits[1], self.bits[2]
+        for y in range(sz-1,-1,-1):
+            for x in range(sz):
+                i = x*sz+y
+                s += "X" if (b1 >> i) & 1 else "O" if (b2 >> i) & 1 else "."
+            s += "\n"
+        return s
+
+STATE_ENGINES = {"list": OthelloState, "bitboard": BitboardState}
+def MakeState(sz = 8, engine = "list"):
+    """ Construct the initial position with the chosen board representation:
+        "list" (OthelloState) or "bitboard" (BitboardState).
+    """
+    return STATE_ENGINES[engine](sz)
+
 class Node:
     """ A node in the game tree. Note wins is always from the viewpoint of playerJustMoved.
         Crashes if state not specified.
     """
+    __slots__ = ("move", "parentNode", "childNodes", "wins", "visits", "untriedMoves", "playerJustMoved")
+
     def __init__(self, move = None, parent = None, state = None):
         self.move = move # the move that got us to this node - "None" for the root node
         self.parentNode = parent # "None" for the root node
@@ -122,12 +540,19 @@ class Node:
         self.untriedMoves = state.GetMoves() # future child nodes
         self.playerJustMoved = state.playerJustMoved # the only part of the state that the Node needs later
         
-    def UCTSelectChild(self):
+    def UCTSelectChild(self, UCTK = 1.0):
         """ Use the UCB1 formula to select a child node. Often a constant UCTK is applied so we have
             lambda c: c.wins/c.visits + UCTK * sqrt(2*log(self.visits)/c.visits to vary the amount of
             exploration versus exploitation.
+            Single pass over the children; on ties the last child wins, as with sorted(...)[-1].
         """
-        s = sorted(self.childNodes, key = lambda c: c.wins/c.visits + sqrt(2*log(self.visits)/c.visits))[-1]
+        k = UCTK * sqrt(2*log(self.visits))
+        s = None
+        best = -1.0
+        for c in self.childNodes:
+            v = c.wins/c.visits + k/sqrt(c.visits)
+            if v >= best:
+                s, best = c, v
         return s
     
     def AddChild(self, m, s):
@@ -146,12 +571,18 @@ class Node:
         self.wins += result
 
     def __repr__(self):
-        return "[M:" + str((self.move[0],7-self.move[1]))+str(self.move) + " Q=W/V:" + str(self.wins) + "/" + str(self.visits) +"="+str(self.wins/self.visits) +" U:" + str(self.untriedMoves) + "]"
+        return self.ToString()
 
-    def TreeToString(self, indent):
-        s = self.IndentString(indent) + str(self)
+    def ToString(self, sz = 8):
+        """ The node as text, its move also with the row counted from the top of an sz*sz board.
+        """
+        m = "root" if self.move is None else str((self.move[0],sz-1-self.move[1]))+str(self.move)
+        return "[M:" + m + " Q=W/V:" + str(self.wins) + "/" + str(self.visits) +"="+str(self.wins/max(1, self.visits)) +" U:" + str(self.untriedMoves) + "]"
+
+    def TreeToString(self, indent, sz = 8):
+        s = self.IndentString(indent) + self.ToString(sz)
         for c in self.childNodes:
-             s += c.TreeToString(indent+1)
+             s += c.TreeToString(indent+1, sz)
         return s
 
     def IndentString(self,indent):
@@ -160,28 +591,391 @@ class Node:
             s += "| "
         return s
 
-    def ChildrenToString(self):
+    def ChildrenToString(self, sz = 8):
         s = ""
         for c in self.childNodes:
-             s += str(c) + "\n"
+             s += c.ToString(sz) + "\n"
         return s
 
-half_corner=[(0,1),(1,0),(0,6),(1,7),(6,0),(7,1),(7,6),(6,7)]
-pre_corner=[(1,1),(6,6),(1,6),(6,1)]
-def UCT(rootstate, itermax, verbose = False):
-    """ Conduct a UCT search for itermax iterations starting from rootstate.
-        Return the best move from the rootstate.
-        Assumes 2 alternating players (player 1 starts), with game results in the range [0.0, 1.0]."""
+class TTNode(Node):
+    """ A node of the transposition-aware search. There is one TTNode per position, shared by
+        every parent that reaches it, so the search tree becomes a DAG: move and parentNode refer
+        to the first parent only, and the move of each edge is kept in the parent's childMoves.
+    """
+    __slots__ = ("childMoves",)
+    def __init__(self, move = None, parent = None, state = None):
+        Node.__init__(self, move, parent, state)
+        self.childMoves = []
+
+    def AddChild(self, m, s, n = None):
+        """ Remove m from untriedMoves and link the child for this move, which is n if the
+            position is already in the transposition table or a new TTNode otherwise.
+            Return the child node
+        """
+        if n is None:
+            n = TTNode(move = m, parent = self, state = s)
+        self.untriedMoves.remove(m)
+        self.childNodes.append(n)
+        self.childMoves.append(m)
+        return n
+
+    def MoveTo(self, child):
+        """ The move leading from this node to child.
+        """
+        return self.childMoves[self.childNodes.index(child)]
+
+class TranspositionTable:
+    """ Bounded map from Zobrist hash (OthelloState.Hash) to the TTNode of that position.
+        When full it evicts the least recently used entry (policy="lru"), or the least
+        visited eighth of the table (policy="visits"). An evicted node stays in the tree
+        that references it; it just can no longer be found by other move orders.
+    """
+    def __init__(self, capacity = 100000, policy = "lru"):
+        assert policy in ("lru", "visits")
+        self.capacity = capacity
+        self.policy = policy
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def Lookup(self, key):
+        """ Return the node stored for key, or None.
+        """
+        n = self.table.get(key)
+        if n is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == "lru":
+            self.table.move_to_end(key)
+        return n
+
+    def Store(self, key, node):
+        self.table[key] = node
+        if len(self.table) > self.capacity:
+            if self.policy == "lru":
+                self.table.popitem(last = False)
+                self.evictions += 1
+            else:
+                victims = sorted(self.table, key = lambda k: self.table[k].visits)[:max(1, self.capacity // 8)]
+                for k in victims:
+                    del self.table[k]
+                self.evictions += len(victims)
+
+    def HitRate(self):
+        return self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+
+    def __len__(self):
+        return len(self.table)
+
+    def __repr__(self):
+        return "[TT: %d/%d entries, hits %d, misses %d, evictions %d]" % (len(self.table), self.capacity, self.hits, self.misses, self.evictions)
+
+def Corners(sz):
+    return [(0,0),(sz-1,0),(0,sz-1),(sz-1,sz-1)]
+
+def HalfCorners(sz):
+    """ The edge squares next to a corner.
+    """
+    return [(0,1),(1,0),(0,sz-2),(1,sz-1),(sz-2,0),(sz-1,1),(sz-1,sz-2),(sz-2,sz-1)]
+
+def PreCorners(sz):
+    """ The squares diagonally next to a corner.
+    """
+    return [(1,1),(sz-2,sz-2),(1,sz-2),(sz-2,1)]
+
+half_corner=HalfCorners(8)
+pre_corner=PreCorners(8)
+def AdjustedVisits(rootstate, move, visits, profile = None):
+    """ Visit count of the root child for move, weighted by the corner heuristics:
+        half-corner and pre-corner squares next to a corner not held by player 2 are
+        discounted, edge squares are preferred. The adjustments are noted in profile.
+    """
+    sz = rootstate.size
+    if move in HalfCorners(sz):
+        ## 离这一格最近的角
+        x=0 if move[0] < sz//2 else sz-1
+        y=0 if move[1] < sz//2 else sz-1
+        # chess = 'O' if rootstate.playerJustMoved ==
+        if rootstate.board[x][y] != 2:
+            visits *= 0.1
+
+        if profile is not None: profile.Note("%s 太菜了 %s" % (move, visits))
+    elif move in PreCorners(sz):
+        x=0 if move[0] < sz//2 else sz-1
+        y=0 if move[1] < sz//2 else sz-1
+        # chess = 'O' if rootstate.playerJustMoved ==
+        if rootstate.board[x][y] != 2:
+            visits *= 0.4
+
+        if profile is not None: profile.Note("%s 半菜了 %s" % (move, visits))
+    else:
+        x=move[0]
+        y=move[1]
+        if x in [0,sz-1] or y in [0,sz-1]:
+            visits *= 1.5
+            if profile is not None: profile.Note("%s 优先占边" % (move,))
+    return visits
+
+def CornerMove(rootstate, profile = None):
+    """ Return a corner if the player to move can take one, else None.
+    """
+    corners = Corners(rootstate.size)
     try:
-        corner_index=[x in rootstate.GetMoves() for x in [(0,0),(7,0),(0,7),(7,7)]].index(True)
-        print('太爽了')
-        return [(0,0),(7,0),(0,7),(7,7)][corner_index]
-    except:
+        corner_index=[x in rootstate.GetMoves() for x in corners].index(True)
+        if profile is not None: profile.Note("太爽了")
+        return corners[corner_index]
+    except ValueError:
+        return None
+
+class SearchInfo:
+    """ What a search did. UCTSearch adds to the counts, so one SearchInfo can total several searches.
+    """
+    def __init__(self):
+        self.iterations = 0
+        self.elapsed = 0.0 # seconds
+        self.stoppedEarly = False # the best move was settled before the time ran out
+        self.score = None # proven final disc difference for the side to move, if the position was solved
+        self.peakNodes = 0 # largest tree size seen, counted when a node budget is set
+        self.recycled = 0 # nodes pruned to stay within the node budget
+        self.rss = None # resident memory of the process in bytes at the end of the search, with a node budget
+
+    def __repr__(self):
+        return "[iterations %d in %.3fs%s%s%s]" % (self.iterations, self.elapsed, ", stopped early" if self.stoppedEarly else "",
+                                                  ", solved %+d" % self.score if self.score is not None else "",
+                                                  ", peak %d nodes, %.1f MiB" % (self.peakNodes, self.rss / 2**20) if self.rss else "")
+
+def ResidentMemory():
+    """ Resident set size of this process in bytes (peak RSS where the current one is unavailable),
+        or None if the platform offers neither.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
         pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # kilobytes on Linux
+
+def TreeSize(rootnode):
+    """ Number of nodes in the tree below (and including) rootnode.
+    """
+    count, stack = 0, [rootnode]
+    while stack:
+        n = stack.pop()
+        count += 1
+        stack.extend(n.childNodes)
+    return count
+
+def RecycleLeaves(rootnode, count):
+    """ Remove up to `count` of the least visited leaves (never the root) from the tree. Their
+        moves go back to the parents' untriedMoves, so they can be expanded again later.
+        Return the number of nodes removed.
+    """
+    removed = 0
+    while removed < count:
+        leaves = []
+        stack = list(rootnode.childNodes)
+        while stack:
+            n = stack.pop()
+            if n.childNodes:
+                stack.extend(n.childNodes)
+            else:
+                leaves.append(n)
+        if not leaves:
+            break
+        leaves.sort(key = lambda n: n.visits)
+        for n in leaves[:count - removed]:
+            ## 回收访问最少的叶节点，父节点可以重新扩展这一步
+            n.parentNode.childNodes.remove(n)
+            n.parentNode.untriedMoves.append(n.move)
+            n.parentNode = None
+            removed += 1
+    return removed
+
+class SearchProfile:
+    """ Opt-in instrumentation of UCTSearch, accumulated over every search it is passed to:
+        time and count per phase, depth of the expanded leaves, branching factor and number
+        of nodes allocated, and length of the random rollouts. Notes from the heuristics and
+        the root statistics of UCT() are kept in `notes` instead of being printed.
+        hook, if given, is called as hook("note", text) for every note and as
+        hook("search", profile) at the end of every search, e.g. to feed a logger or profiler.
+    """
+    PHASES = ("select", "expand", "rollout", "backpropagate")
 
-    rootnode = Node(state = rootstate)
+    def __init__(self, hook = None):
+        self.hook = hook
+        self.time = dict((p, 0.0) for p in self.PHASES) # seconds
+        self.count = dict((p, 0) for p in self.PHASES)
+        self.searches = 0
+        self.maxDepth = 0
+        self.depthTotal = 0 # summed over the iterations, see MeanDepth
+        self.nodesAllocated = 0
+        self.branchTotal = 0 # legal moves summed over the allocated nodes
+        self.rollouts = 0 # random rollouts played move by move
+        self.rolloutMoves = 0
+        self.maxRolloutLength = 0
+        self.notes = []
 
-    for i in range(itermax):
+    def Note(self, text):
+        self.notes.append(text)
+        if self.hook is not None:
+            self.hook("note", text)
+
+    def Done(self):
+        self.searches += 1
+        if self.hook is not None:
+            self.hook("search", self)
+
+    def MeanDepth(self):
+        return self.depthTotal / max(1, self.count["select"])
+
+    def MeanBranching(self):
+        return self.branchTotal / max(1, self.nodesAllocated)
+
+    def MeanRolloutLength(self):
+        return self.rolloutMoves / max(1, self.rollouts)
+
+    def AsDict(self):
+        return {"searches": self.searches, "time": dict(self.time), "count": dict(self.count),
+                "maxDepth": self.maxDepth, "meanDepth": self.MeanDepth(), "nodesAllocated": self.nodesAllocated,
+                "meanBranching": self.MeanBranching(), "rollouts": self.rollouts,
+                "meanRolloutLength": self.MeanRolloutLength(), "maxRolloutLength": self.maxRolloutLength}
+
+    def __repr__(self):
+        phases = ", ".join("%s %.3fs" % (p, self.time[p]) for p in self.PHASES)
+        return "[%s; depth %.1f (max %d), branching %.1f, %d nodes, rollout length %.1f]" % (phases,
+               self.MeanDepth(), self.maxDepth, self.MeanBranching(), self.nodesAllocated, self.MeanRolloutLength())
+
+class GameClock:
+    """ Total thinking time of one player for a whole game, shared out over the moves left.
+    """
+    def __init__(self, total_ms):
+        self.remaining = total_ms
+
+    def Budget(self, state, timeout = None):
+        """ Milliseconds to spend on the next move: the remaining time divided by the number
+            of moves this player still has to make, capped at timeout if given.
+        """
+        movesLeft = max(1, (state.Empties() + 1) // 2)
+        budget = self.remaining / movesLeft
+        return min(budget, timeout) if timeout is not None else budget
+
+    def Spend(self, ms):
+        self.remaining = max(0.0, self.remaining - ms)
+
+def Settled(rootnode, remaining):
+    """ True if no other root move can catch up with the most visited one in `remaining`
+        more iterations.
+    """
+    visits = sorted([c.visits for c in rootnode.childNodes] + [0]*len(rootnode.untriedMoves))
+    if len(visits) < 2:
+        return True
+    return visits[-1] - visits[-2] > remaining
+
+ENDGAME_EMPTIES = 10 # positions with this many empty squares or fewer are solved exactly
+SYMMETRY_PLIES = 12 # symmetric positions are only looked for this many moves from the start
+
+def UniqueMoves(state, moves):
+    """ moves with one representative kept per class of moves that the symmetries of state
+        map onto each other (they lead to equivalent positions).
+    """
+    hashes = state.SymmetryHashes()
+    stabilizer = [k for k in range(1, 8) if hashes[k] == hashes[0]]
+    if not stabilizer:
+        return moves
+    unique = []
+    equivalent = set()
+    for m in moves:
+        if m not in equivalent:
+            unique.append(m)
+            equivalent.update(Transform(m, k, state.size) for k in stabilizer)
+    return unique
+
+def EarlyPosition(state, plies = SYMMETRY_PLIES):
+    """ Is state at most `plies` moves from the start (counting the discs on the board)?
+    """
+    return state.size*state.size - state.Empties() <= 4 + plies
+
+def EndgameMove(rootstate, endgame = ENDGAME_EMPTIES, info = None):
+    """ If rootstate has at most `endgame` empty squares, solve it exactly and return the
+        proven best move (its score goes to info.score); otherwise return None.
+    """
+    if not endgame or rootstate.Empties() > endgame or not rootstate.HasMoves():
+        return None
+    from endgame import EndgameSolver
+    start = time.time()
+    (move, score) = EndgameSolver(rootstate.size).Solve(rootstate)
+    if info is not None:
+        info.score = score
+        info.elapsed += time.time() - start
+    return move
+
+UCTK = 1.0 # exploration constant of UCB1
+
+def UCTSearch(rootstate, itermax, rollout = "random", playouts = 16, inplace = False, tt = None, rootnode = None,
+              timeout = None, info = None, exactleaves = 0, uctk = UCTK, profile = None, maxnodes = None, recycle = True,
+              symmetry = SYMMETRY_PLIES, earlystop = True):
+    """ Run itermax UCT iterations starting from rootstate and return the root node of the search.
+        Assumes 2 alternating players (player 1 starts), with game results in the range [0.0, 1.0].
+        rollout="batch" evaluates each new leaf with `playouts` random games played together
+        by the NumPy engine in batchrollout.py, and backpropagates their mean result.
+        rollout="pattern" draws the rollout moves with the corner/edge weights of patterns.py.
+        inplace=True plays every iteration on rootstate itself and takes the moves back
+        with UndoMove afterwards, instead of cloning rootstate once per iteration.
+        tt=TranspositionTable() makes positions reached by different move orders share one
+        node and its statistics; the table may be kept and passed again on later moves.
+        rootnode continues the search in an existing tree for rootstate (see UCTSearcher).
+        timeout (ms) bounds the search by wall-clock time; itermax may then be None. The clock
+        is checked every 16 iterations, and the search also stops as soon as the most visited
+        root move can no longer be overtaken at the current iteration rate (unless earlystop=False).
+        info (a SearchInfo) receives the iteration count and elapsed time.
+        Leaves with at most `exactleaves` empty squares get their exact result from the
+        endgame solver instead of a random rollout.
+        uctk scales the exploration term of UCB1.
+        profile (a SearchProfile) receives per-phase timings and tree statistics.
+        maxnodes bounds the size of the tree. When it is reached, recycle=True prunes the least
+        visited leaves down to 90% of the budget (see RecycleLeaves); recycle=False stops
+        expanding and keeps refining the existing nodes, rolling out from where selection ends.
+        info then also gets the peak node count, the nodes recycled and the resident memory.
+        In positions at most `symmetry` moves from the start (0 turns it off), moves that lead
+        to rotations or reflections of the same position are expanded only once (UniqueMoves),
+        so the iterations are not split between equivalent children.
+    """
+    assert itermax is not None or timeout is not None
+    assert maxnodes is None or tt is None, "the node budget needs a tree, not a transposition table DAG"
+    start = time.time()
+    done = 0
+    if rollout == "batch" and rootstate.size != 8:
+        rollout = "random" # the numpy rollouts pack a board into one uint64
+    if rollout == "batch":
+        from batchrollout import BatchRollout
+    elif rollout == "pattern":
+        from patterns import PatternMove
+    if exactleaves:
+        from endgame import EndgameSolver
+        solver = EndgameSolver(rootstate.size)
+
+    if rootnode is None and tt is None:
+        rootnode = Node(state = rootstate)
+        if symmetry and EarlyPosition(rootstate, symmetry):
+            rootnode.untriedMoves = UniqueMoves(rootstate, rootnode.untriedMoves)
+    elif rootnode is None:
+        rootnode = tt.Lookup(rootstate.Hash())
+        if rootnode is None:
+            rootnode = TTNode(state = rootstate)
+            if symmetry and EarlyPosition(rootstate, symmetry):
+                rootnode.untriedMoves = UniqueMoves(rootstate, rootnode.untriedMoves)
+            tt.Store(rootstate.Hash(), rootnode)
+    if maxnodes is not None:
+        nodes = TreeSize(rootnode)
+        peak = nodes
+
+    for i in (range(itermax) if itermax is not None else itertools.count()):
         ## 该itermax实际控制了搜索树的size
 
         ## 每一次循环都将rootstate复制进行操作
@@ -190,45 +984,123 @@ def UCT(rootstate, itermax, verbose = False):
         ## state是复制的变量
         ## 但是node仅仅是rootnode的引用
 
+        if maxnodes is not None and nodes >= maxnodes and recycle:
+            recycled = RecycleLeaves(rootnode, nodes - int(maxnodes * 0.9))
+            nodes -= recycled
+            if info is not None:
+                info.recycled += recycled
+        if profile is not None:
+            t0 = time.perf_counter()
         node = rootnode
-        state = rootstate.Clone()
+        path = [rootnode] # nodes visited this iteration, for backpropagation in the DAG
+        if inplace:
+            ## 直接在rootstate上走子，本轮结束后用UndoMove撤回
+            state = rootstate
+            depth = len(state.undoStack)
+        else:
+            state = rootstate.Clone()
 
 
         ## 遍历已经查找过并且有子节点的节点
         while node.untriedMoves == [] and node.childNodes != []: # node is fully expanded and non-terminal
-            node = node.UCTSelectChild()
-            state.DoMove(node.move)
+            if tt is None:
+                node = node.UCTSelectChild(uctk)
+                state.DoMove(node.move)
+            else:
+                child = node.UCTSelectChild(uctk)
+                state.DoMove(node.MoveTo(child))
+                node = child
+                path.append(node)
+        if profile is not None:
+            t1 = time.perf_counter()
+            profile.time["select"] += t1 - t0
+            profile.count["select"] += 1
 
         ## 现在node(即rootnode)在有未尝试的叶节点的节点上
 
         # Expand
-        if node.untriedMoves != []: # if we can expand (i.e. state/node is non-terminal)
+        if node.untriedMoves != [] and (maxnodes is None or nodes < maxnodes): # if we can expand (i.e. state/node is non-terminal)
             m = random.choice(node.untriedMoves) 
             state.DoMove(m)
-            node = node.AddChild(m,state) # add child and descend tree
+            if tt is None:
+                node = node.AddChild(m,state) # add child and descend tree
+                child = None
+                if maxnodes is not None:
+                    nodes += 1
+                    peak = max(peak, nodes)
+            else:
+                ## 不同走子顺序到达的同一局面共用一个节点
+                key = state.Hash()
+                child = tt.Lookup(key)
+                node = node.AddChild(m,state,child)
+                if child is None:
+                    tt.Store(key, node)
+                path.append(node)
+            if child is None and symmetry and EarlyPosition(state, symmetry):
+                ## 对称的走法只保留一个，搜索预算不再分给等价的子节点
+                node.untriedMoves = UniqueMoves(state, node.untriedMoves)
+            if profile is not None:
+                if child is None: # a node was allocated
+                    profile.nodesAllocated += 1
+                    profile.branchTotal += len(node.untriedMoves)
+                profile.count["expand"] += 1
 
             ## 现在node是本轮扩展的子节点，state是node根据执行m扩展的子节点的state
             ## 该子节点 state=state parent=之前的node
         # 第三个
-        else:
+        elif node.untriedMoves == []:
             ## 此时认为搜索树已经完全扩展了
+            if inplace:
+                while len(state.undoStack) > depth:
+                    state.UndoMove()
             break
+        ## 否则节点数已到上限(recycle=False)，不扩展，直接从选到的节点模拟
+
+        if profile is not None:
+            leafDepth = len(path) - 1
+            if tt is None:
+                n = node
+                while n is not rootnode:
+                    (n, leafDepth) = (n.parentNode, leafDepth + 1)
+            profile.depthTotal += leafDepth
+            profile.maxDepth = max(profile.maxDepth, leafDepth)
+            t2 = time.perf_counter()
+            profile.time["expand"] += t2 - t1 # no time is spent expanding when the budget is full
 
-        # Rollout - this can often be made orders of magnitude quicker using a state.GetRandomMove() function
+        # Rollout
         ## 从子节点的state出发，随机抽取move进行模拟
 
         ## 第二个改进
-        if str(state).count('.')>=-1:
-            while state.GetMoves() != []:  # while state is non-terminal
-                state.DoMove(random.choice(state.GetMoves()))
+        score1 = None # player 1视角的结果, None表示直接用模拟终局的state
+        if exactleaves and state.Empties() <= exactleaves:
+            ## 剩余空格不多时直接求出精确胜负(min max)
+            score1 = solver.Result(state, 1)
+        elif rollout == "batch":
+            ## 一次调用模拟playouts局，score1为player 1视角的平均结果
+            score1 = BatchRollout(state, playouts)
+        elif rollout == "pattern" or profile is not None:
+            ## pattern: 按边角模式表的权重抽取走法
+            length = 0
+            while state.HasMoves():
+                state.DoMove(PatternMove(state) if rollout == "pattern" else state.GetRandomMove())
+                length += 1
+            if profile is not None:
+                profile.rollouts += 1
+                profile.rolloutMoves += length
+                profile.maxRolloutLength = max(profile.maxRolloutLength, length)
         else:
-            ## use min_max
-            print('min max')
-            pass
+            while state.HasMoves():  # while state is non-terminal
+                state.DoMove(state.GetRandomMove())
+        if profile is not None:
+            t3 = time.perf_counter()
+            profile.time["rollout"] += t3 - t2
+            profile.count["rollout"] += 1
 
         # Backpropagate
 
         # tmp_result=
+        if tt is not None:
+            node = path.pop()
         while node != None: # backpropagate from the expanded node and work back to the root node
 
             ## 第一个改进：加入规则判断，提高边角权重，降低半角权重
@@ -238,55 +1110,292 @@ def UCT(rootstate, itermax, verbose = False):
             #     node.Update(state.GetResult(node.playerJustMoved)+_weight)
             # else:
                 # state is terminal. Update node with result from POV of node.playerJustMoved
-            node.Update(state.GetResult(node.playerJustMoved))
-            node = node.parentNode
+            if score1 is not None:
+                node.Update(score1 if node.playerJustMoved == 1 else 1.0 - score1)
+            else:
+                node.Update(state.GetResult(node.playerJustMoved))
+            if tt is None:
+                node = node.parentNode
+            else:
+                node = path.pop() if path else None
+        if profile is not None:
+            profile.time["backpropagate"] += time.perf_counter() - t3
+            profile.count["backpropagate"] += 1
+
+        if inplace:
+            ## 撤回本轮在rootstate上走过的所有棋(树内+模拟)
+            while len(state.undoStack) > depth:
+                state.UndoMove()
+
+        done += 1
+        if timeout is not None and done % 16 == 0:
+            ## 按当前速度估计剩余时间内还能跑多少轮
+            elapsed = time.time() - start
+            left = timeout / 1000.0 - elapsed
+            if left <= 0:
+                break
+            if earlystop and Settled(rootnode, done / max(elapsed, 1e-6) * left):
+                if info is not None:
+                    info.stoppedEarly = True
+                break
+
+    if info is not None:
+        info.iterations += done
+        info.elapsed += time.time() - start
+        if maxnodes is not None:
+            info.peakNodes = max(info.peakNodes, peak)
+            info.rss = ResidentMemory()
+    if profile is not None:
+        profile.Done()
+    return rootnode
+
+def RootStats(rootnode):
+    """ [(move, wins, visits)] of the children of a search root.
+    """
+    moves = rootnode.childMoves if isinstance(rootnode, TTNode) else [c.move for c in rootnode.childNodes]
+    return [(m, c.wins, c.visits) for (m, c) in zip(moves, rootnode.childNodes)]
+
+def BestMove(rootstate, stats, heuristics = True, profile = None):
+    """ Pick the move to play from [(move, wins, visits)] root statistics: the most visited
+        one, after the corner heuristics of AdjustedVisits unless heuristics is False.
+    """
+    ## 启发式只调整用于选择的分数，不改动节点本身的visits
+    scores = [(AdjustedVisits(rootstate, m, v, profile) if heuristics else v, m) for (m, w, v) in stats]
+    return sorted(scores, key = lambda c: c[0])[-1][1] # return the move that was most visited
+
+def UCT(rootstate, itermax, verbose = False, rollout = "random", playouts = 16, inplace = False, tt = None,
+        timeout = None, clock = None, info = None, endgame = ENDGAME_EMPTIES, uctk = UCTK, heuristics = True,
+        profile = None, book = None, maxnodes = None, recycle = True):
+    """ Conduct a UCT search for itermax iterations starting from rootstate.
+        Return the best move from the rootstate.
+        See UCTSearch for the rollout, inplace, tt, timeout, info, uctk, maxnodes and recycle options. With a GameClock
+        the move gets its share of the remaining game time (at most timeout ms if given).
+        Positions with at most `endgame` empty squares are solved exactly instead (0 turns it off).
+        heuristics=False turns off the corner rules (CornerMove, AdjustedVisits).
+        verbose=True prints the whole tree; the root children go to profile.notes if a profile is given.
+        Positions in the opening book (book.OpeningBook) are answered from it without searching."""
+    if book is not None:
+        move = book.Lookup(rootstate)
+        if move is not None:
+            return move
+    info = info if info is not None else SearchInfo()
+    proven = EndgameMove(rootstate, endgame, info)
+    if proven is not None:
+        return proven
+
+    corner = CornerMove(rootstate, profile) if heuristics else None
+    if corner is not None:
+        return corner
+
+    elapsed = info.elapsed
+    if clock is not None:
+        timeout = clock.Budget(rootstate, timeout)
+    rootnode = UCTSearch(rootstate, itermax, rollout = rollout, playouts = playouts, inplace = inplace, tt = tt,
+                         timeout = timeout, info = info, uctk = uctk, profile = profile, maxnodes = maxnodes, recycle = recycle)
+    if clock is not None:
+        clock.Spend((info.elapsed - elapsed) * 1000)
 
     # Output some information about the tree - can be omitted
-    if (verbose): print (rootnode.TreeToString(0))
-    else: print (rootnode.ChildrenToString())
-
-    for childNode in rootnode.childNodes:
-        if childNode.move in half_corner:
-            print(childNode.visits,end='\t')
-            x=0 if childNode.move[0] < 4 else 7
-            y=0 if childNode.move[0] < 4 else 7
-            # chess = 'O' if rootstate.playerJustMoved ==
-            if rootstate.board[x][y] != 2:
-                childNode.visits *= 0.1
-
-            print(childNode.move,'太菜了',childNode.visits)
-        elif childNode.move in pre_corner:
-            print(childNode.visits,end='\t')
-            x=0 if childNode.move[0] < 4 else 7
-            y=0 if childNode.move[0] < 4 else 7
-            # chess = 'O' if rootstate.playerJustMoved ==
-            if rootstate.board[x][y] != 2:
-                childNode.visits *= 0.4
-
-            print(childNode.move,'半菜了',childNode.visits)
-        else:
-            x=childNode.move[0]
-            y=childNode.move[1]
-            if x in [0,7] or y in [0,7]:
-                childNode.visits *= 1.5
-                print(childNode.move,'优先占边')
-    return sorted(rootnode.childNodes, key = lambda c: c.visits)[-1].move # return the move that was most visited
+    if (verbose): print (rootnode.TreeToString(0, rootstate.size))
+    if profile is not None: profile.Note(rootnode.ChildrenToString(rootstate.size))
+
+    return BestMove(rootstate, RootStats(rootnode), heuristics, profile)
+
+def PrincipalVariation(rootnode, maxlen = 12):
+    """ The moves along the most visited children from rootnode.
+    """
+    pv = []
+    node = rootnode
+    while node.childNodes and len(pv) < maxlen:
+        child = max(node.childNodes, key = lambda c: c.visits)
+        pv.append(node.MoveTo(child) if isinstance(node, TTNode) else child.move)
+        node = child
+    return pv
+
+class SearchSnapshot:
+    """ Progress of a running UCTAnalyze: iterations and elapsed seconds so far, the rate
+        over the last slice, the root children as (move, visits, win rate of the side to
+        move) most visited first, and the principal variation.
+    """
+    __slots__ = ("iterations", "elapsed", "rate", "children", "pv")
+
+    def __init__(self, rootnode, iterations, elapsed, rate):
+        self.iterations = iterations
+        self.elapsed = elapsed
+        self.rate = rate # iterations/s
+        self.children = sorted(((m, v, w / v if v else 0.0) for (m, w, v) in RootStats(rootnode)), key = lambda c: -c[1])
+        self.pv = PrincipalVariation(rootnode)
+
+    def Best(self):
+        return self.children[0][0] if self.children else None
+
+    def __repr__(self):
+        return "[%d iterations, %.0f/s, pv %s, %s]" % (self.iterations, self.rate, " ".join(str(m) for m in self.pv),
+                                                       ", ".join("%s %d %.2f" % c for c in self.children[:5]))
+
+def UCTAnalyze(rootstate, every = 256, everyms = None, itermax = None, timeout = None, rootnode = None, **options):
+    """ Generator running UCTSearch from rootstate in slices and yielding a SearchSnapshot
+        after each: every `every` iterations, or every `everyms` milliseconds if given.
+        Stops after itermax iterations or timeout ms (runs until closed if neither is given);
+        close the generator to stop the search early. Other options go to UCTSearch.
+    """
+    info = SearchInfo()
+    start = time.time()
+    while True:
+        if itermax is not None and info.iterations >= itermax:
+            return
+        if timeout is not None and (time.time() - start) * 1000 >= timeout:
+            return
+        n = every if everyms is None else None
+        ms = everyms
+        if itermax is not None and (n is None or info.iterations + n > itermax):
+            n = itermax - info.iterations
+        if timeout is not None:
+            left = timeout - (time.time() - start) * 1000
+            ms = left if ms is None else min(ms, left)
+        (done, elapsed) = (info.iterations, info.elapsed)
+        rootnode = UCTSearch(rootstate, n, rootnode = rootnode, timeout = ms, info = info, earlystop = False, **options)
+        if info.iterations == done: # nothing left to search (terminal tree)
+            return
+        yield SearchSnapshot(rootnode, info.iterations, time.time() - start,
+                             (info.iterations - done) / max(info.elapsed - elapsed, 1e-9))
+
+class UCTSearcher:
+    """ A UCT player that keeps its search tree between moves. After every move actually
+        played (by either side) call Play(move): the root moves down to that child, keeping
+        its statistics, and the dropped siblings are pruned. If the position passed to
+        Search is not the root of the kept tree (a pass, a new game) the tree starts afresh.
+    """
+    def __init__(self, itermax = 1000, verbose = False, timeout = None, clock = None, endgame = ENDGAME_EMPTIES,
+                 heuristics = True, profile = None, book = None, **options):
+        self.itermax = itermax
+        self.verbose = verbose
+        self.endgame = endgame
+        self.heuristics = heuristics # corner rules of CornerMove and AdjustedVisits
+        self.profile = profile # SearchProfile collecting statistics over all searches
+        self.book = book # OpeningBook consulted before searching
+        self.timeout = timeout # ms per move
+        self.clock = clock # GameClock for the whole game
+        self.options = options # passed to UCTSearch: rollout, playouts, inplace, tt, exactleaves, uctk
+        self.rootnode = None
+        self.rootstate = None
+
+    def Search(self, rootstate, itermax = None, info = None, timeout = None):
+        """ Search itermax more iterations (or the time budget) from rootstate, on top of
+            those kept from earlier moves, and return the best move. timeout (ms) overrides
+            the searcher's own budget for this move.
+        """
+        if self.book is not None:
+            move = self.book.Lookup(rootstate)
+            if move is not None:
+                return move
+        info = info if info is not None else SearchInfo()
+        proven = EndgameMove(rootstate, self.endgame, info)
+        if proven is not None:
+            return proven
+        corner = CornerMove(rootstate, self.profile) if self.heuristics else None
+        if corner is not None:
+            return corner
+        self.SetRoot(rootstate)
+        elapsed = info.elapsed
+        if timeout is None:
+            timeout = self.clock.Budget(rootstate, self.timeout) if self.clock is not None else self.timeout
+        self.rootnode = UCTSearch(rootstate, itermax or self.itermax, rootnode = self.rootnode,
+                                  timeout = timeout, info = info, profile = self.profile, **self.options)
+        if self.clock is not None:
+            self.clock.Spend((info.elapsed - elapsed) * 1000)
+
+        # Output some information about the tree - can be omitted
+        if (self.verbose): print (self.rootnode.TreeToString(0, rootstate.size))
+        if self.profile is not None: self.profile.Note(self.rootnode.ChildrenToString(rootstate.size))
+
+        return BestMove(rootstate, RootStats(self.rootnode), self.heuristics, self.profile)
+
+    def Ponder(self, rootstate, iterations = 64):
+        """ Grow the kept tree for rootstate by a few iterations without choosing a move,
+            e.g. while the opponent is thinking.
+        """
+        self.SetRoot(rootstate)
+        self.rootnode = UCTSearch(rootstate, iterations, rootnode = self.rootnode, profile = self.profile, **self.options)
+
+    def Prediction(self):
+        """ The most visited move at the root, i.e. the reply the tree expects, or None.
+        """
+        if self.rootnode is None or self.rootnode.childNodes == []:
+            return None
+        stats = RootStats(self.rootnode)
+        return sorted(stats, key = lambda c: c[2])[-1][0]
+
+    def SetRoot(self, rootstate):
+        """ Keep the tree if it was grown for rootstate, otherwise start a new one.
+        """
+        if self.rootstate is None or self.rootstate.Hash() != rootstate.Hash():
+            self.Reset()
+            self.rootstate = rootstate.Clone()
+
+    def Play(self, move):
+        """ Move the root down to the child for move, which has just been played.
+        """
+        if self.rootstate is None:
+            return
+        child = None
+        if self.rootnode is not None:
+            moves = self.rootnode.childMoves if isinstance(self.rootnode, TTNode) else [c.move for c in self.rootnode.childNodes]
+            if move in moves:
+                child = self.rootnode.childNodes[moves.index(move)]
+            if not isinstance(self.rootnode, TTNode):
+                if child is not None:
+                    self.rootnode.childNodes.remove(child)
+                    child.parentNode = None
+                self.Prune(self.rootnode)
+        self.rootnode = child
+        self.rootstate.DoMove(move)
+
+    def Reset(self):
+        """ Forget the tree.
+        """
+        if self.rootnode is not None:
+            self.Prune(self.rootnode)
+        self.rootnode = None
+        self.rootstate = None
+
+    def Prune(self, node):
+        """ Unlink node and its subtree so the nodes are freed right away instead of waiting
+            for the cycle collector (children and parents reference each other).
+        """
+        if isinstance(node, TTNode):
+            return # nodes may be shared with the transposition table
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            stack.extend(n.childNodes)
+            n.childNodes = []
+            n.parentNode = None
                 
-def UCTPlayGame():
+def UCTPlayGame(engine = "bitboard", writer = None):
     """ Play a sample game between two UCT players where each player gets a different number 
         of UCT iterations (= simulations = tree nodes).
+        With writer (a records.RecordWriter) the game is also appended to its record file.
     """
-    state = OthelloState()
-    while (state.GetMoves() != []):
+    state = MakeState(engine = engine)
+    players = {1: UCTSearcher(itermax = 1000), 2: UCTSearcher(itermax = 1000)} # each player keeps its own tree
+    line = []
+    while (state.HasMoves()):
         print (str(state))
         if state.playerJustMoved == 1:
-            m = UCT(rootstate = state, itermax = 1000, verbose = False) # play with values for itermax and verbose = True
-            print ("Player",state.playerJustMoved,"Best Move: " + str((m[0],7-m[1])) + "\n")
+            m = players[2].Search(state) # play with values for itermax and verbose = True
+            print ("Player",state.playerJustMoved,"Best Move: " + str((m[0],state.size-1-m[1])) + "\n")
 
         else:
-            m = UCT(rootstate = state, itermax = 1000, verbose = False)
-            print ("Player",state.playerJustMoved,"Best Move: " + str((m[0],7-m[1])) + " with minmax\n")
+            m = players[1].Search(state)
+            print ("Player",state.playerJustMoved,"Best Move: " + str((m[0],state.size-1-m[1])) + " with minmax\n")
         state.DoMove(m)
+        line.append(m)
+        for p in players.values():
+            p.Play(m)
+    if writer is not None:
+        settings = {"itermax": 1000, "engine": engine}
+        writer.WriteState(line, state, black = settings, white = settings)
     if state.GetResult(state.playerJustMoved) == 1.0:
         print ("Player " + str(state.playerJustMoved) + " wins!")
     elif state.GetResult(state.playerJustMoved) == 0.0:
@@ -295,30 +1404,45 @@ def UCTPlayGame():
 
 
 ## 执行gui传回的move
-def UCTreceive(state,x,y):
+def UCTreceive(state,x,y,searcher = None):
     print(x,y)
     state.DoMove((x,y))
+    if searcher is not None:
+        searcher.Play((x,y))
     return state
 
+def _AIMove(state, searcher, info, book, maxnodes):
+    if searcher is None:
+        m = UCT(rootstate = state, itermax = 10, verbose = False, info = info, book = book, maxnodes = maxnodes)
+    else:
+        m = searcher.Search(state, info = info)
+    state.DoMove(m)
+    if searcher is not None:
+        searcher.Play(m)
+
 ## 根据GUI传回的state计算ai的move
-def UCTaimove(state):
+## 传入searcher(UCTSearcher)时搜索树会在两步之间保留
+## 传入info(SearchInfo)时记录本次搜索的轮数和用时
+## 传入book(OpeningBook)时开局直接查表 (使用searcher时由searcher自己的book负责)
+## 传入maxnodes时搜索树最多这么多个节点 (使用searcher时由searcher的options负责)
+def UCTaimove(state, searcher = None, info = None, book = None, maxnodes = None):
 
     ## ai先走一步
-    state.DoMove(UCT(rootstate = state, itermax = 10, verbose = False))
+    _AIMove(state, searcher, info, book, maxnodes)
     ## 每次ai走完棋之后 player会反转
 
     ## 人没有棋可走 令ai连续走棋
-    while state.GetMoves()==[]:
+    while not state.HasMoves():
         state.playerJustMoved=3-state.playerJustMoved
         ## ai 没有棋可走
-        if state.GetMoves()==[]:
+        if not state.HasMoves():
             ## 游戏结束
             return state.GetResult(playerjm=state.playerJustMoved)
 
         ## ai 尚有棋可走
         else:
             ## 每次ai走完棋之后 player会反转
-            state.DoMove(UCT(rootstate=state, itermax=10, verbose=False))
+            _AIMove(state, searcher, info, book, maxnodes)
     return state
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+""" Self-play tournament between two engine settings.
+
+    python arena.py "base:itermax=1000" "fast:itermax=1000,engine=bitboard,rollout=batch" --games 2000
+
+    A player is "name:key=value,..." with the keys of PLAYER_DEFAULTS:
+
+        itermax             UCT iterations per move (0 for no limit, then timeout is needed)
+        timeout             ms per move
+        heuristics          1/0, corner rules of CornerMove and AdjustedVisits
+        rollout, playouts   as in UCTSearch ("random" or "batch")
+        engine              state representation, see STATE_ENGINES
+        endgame             exact solving from this many empty squares (0 off)
+        uctk                UCB1 exploration constant
+
+    Games are spread over a process pool. Game i is played with random seed seed+i and the
+    first player takes black in even games, white in odd ones, so a run is reproducible
+    game by game for fixed iteration counts. Every finished game is appended to the JSONL
+    file at once, and with --records also to a binary record file (see records.py). The
+    summary gives the first player's score, the Elo difference with a 95% confidence
+    interval and the average time per move of each player.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from UCT import *
+
+PLAYER_DEFAULTS = {"itermax": 1000, "timeout": None, "heuristics": True, "rollout": "random", "playouts": 16,
+                   "engine": "bitboard", "endgame": ENDGAME_EMPTIES, "uctk": UCTK}
+
+def ParsePlayer(text):
+    """ "name:key=value,..." -> settings dict with a "name" entry, see PLAYER_DEFAULTS.
+    """
+    (name, _, spec) = text.partition(":")
+    player = dict(PLAYER_DEFAULTS, name = name)
+    for item in filter(None, spec.split(",")):
+        (key, _, value) = item.partition("=")
+        if key not in PLAYER_DEFAULTS:
+            raise ValueError("unknown player setting %r" % key)
+        if key == "heuristics":
+            player[key] = value.lower() not in ("0", "false", "off", "no")
+        elif key == "itermax":
+            player[key] = int(value) or None
+        elif key in ("playouts", "endgame"):
+            player[key] = int(value)
+        elif key in ("timeout", "uctk"):
+            player[key] = float(value)
+        else:
+            player[key] = value
+    if player["itermax"] is None and player["timeout"] is None:
+        raise ValueError("player %s needs itermax or timeout" % name)
+    return player
+
+def _Searcher(player):
+    options = dict((k, v) for (k, v) in player.items() if k not in ("name", "engine"))
+    return UCTSearcher(**options)
+
+def PlayGame(game, seed, black, white):
+    """ Play one game, black (player 1) against white (player 2), and return its record.
+    """
+    random.seed(seed)
+    searchers = {1: _Searcher(black), 2: _Searcher(white)}
+    states = {1: MakeState(engine = black["engine"]), 2: MakeState(engine = white["engine"])} # each in its player's engine
+    thinking = {1: 0.0, 2: 0.0}
+    moves = {1: 0, 2: 0}
+    line = [] # the moves played, None for a pass
+    state = states[1]
+    passes = 0
+    while passes < 2:
+        p = 3 - state.playerJustMoved
+        if not state.HasMoves():
+            for s in states.values():
+                s.playerJustMoved = p # pass
+            line.append(None)
+            passes += 1
+            continue
+        passes = 0
+        start = time.time()
+        m = searchers[p].Search(states[p])
+        thinking[p] += time.time() - start
+        moves[p] += 1
+        line.append(m)
+        for s in states.values():
+            s.DoMove(m)
+        for s in searchers.values():
+            s.Play(m)
+    discs = [sum(col.count(p) for col in state.board) for p in (0, 1, 2)]
+    return {"game": game, "seed": seed, "black": black["name"], "white": white["name"],
+            "result": state.GetResult(1), "discs": [discs[1], discs[2]],
+            "moves": [moves[1], moves[2]], "seconds": [round(thinking[1], 4), round(thinking[2], 4)],
+            "line": line[:-2]} # without the two closing passes
+
+def Elo(score):
+    """ Elo difference matching an expected score in (0, 1).
+    """
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+def Summary(records, first, second):
+    """ Score, Elo difference with 95% interval and time per move, from first's viewpoint.
+        Raises ValueError if there are no records.
+    """
+    if not records:
+        raise ValueError("no games to summarize")
+    scores = []
+    seconds = {first: 0.0, second: 0.0}
+    moves = {first: 0, second: 0}
+    for r in records:
+        black = r["black"] == first
+        scores.append(r["result"] if black else 1.0 - r["result"])
+        for (i, name) in enumerate((r["black"], r["white"])):
+            seconds[name] += r["seconds"][i]
+            moves[name] += r["moves"][i]
+    n = len(scores)
+    mean = sum(scores) / n
+    var = sum((s - mean)**2 for s in scores) / max(1, n - 1)
+    margin = 1.96 * math.sqrt(var / n)
+    return {"games": n, "wins": scores.count(1.0), "draws": scores.count(0.5), "losses": scores.count(0.0),
+            "score": mean, "elo": Elo(mean), "elo_low": Elo(mean - margin), "elo_high": Elo(mean + margin),
+            "ms_per_move": dict((p, 1000.0 * seconds[p] / max(1, moves[p])) for p in (first, second))}
+
+def RunTournament(first, second, games, out, workers = None, seed = 0, records = None):
+    """ Play `games` games between two players (settings dicts) over a process pool,
+        writing each record to the open file out as it finishes, and to records
+        (a records.RecordWriter) if given. Return the records.
+    """
+    players = {first["name"]: first, second["name"]: second}
+    results = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(PlayGame, i, seed + i, *((first, second) if i % 2 == 0 else (second, first)))
+                   for i in range(games)]
+        for f in as_completed(futures):
+            r = f.result()
+            results.append(r)
+            out.write(json.dumps(r) + "\n")
+            out.flush()
+            if records is not None:
+                records.Write([m and tuple(m) for m in r["line"]], r["discs"], r["seed"], players[r["black"]], players[r["white"]])
+    return results
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Play a match between two engine settings")
+    parser.add_argument("first", type = ParsePlayer)
+    parser.add_argument("second", type = ParsePlayer)
+    parser.add_argument("--games", type = int, default = 100)
+    parser.add_argument("--workers", type = int, default = None, help = "game processes (default: cpu count)")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of game 0, game i uses seed+i")
+    parser.add_argument("--out", default = "arena.jsonl", help = "JSONL file for the game records (- for stdout)")
+    parser.add_argument("--records", default = None, help = "also append the games to this binary record file")
+    args = parser.parse_args(argv)
+    if args.first["name"] == args.second["name"]:
+        parser.error("the players need different names")
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    out = sys.stdout if args.out == "-" else open(args.out, "a")
+    writer = None
+    if args.records is not None:
+        from records import RecordWriter
+        writer = RecordWriter(args.records)
+    try:
+        records = RunTournament(args.first, args.second, args.games, out, args.workers, args.seed, writer)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if writer is not None:
+            writer.Close()
+    s = Summary(records, args.first["name"], args.second["name"])
+    print("%s vs %s: +%d =%d -%d in %d games, score %.3f" % (args.first["name"], args.second["name"],
+          s["wins"], s["draws"], s["losses"], s["games"], s["score"]))
+    print("Elo %+.0f (95%% interval %+.0f .. %+.0f)" % (s["elo"], s["elo_low"], s["elo_high"]))
+    for (name, ms) in s["ms_per_move"].items():
+        print("%-12s %8.1f ms/move" % (name, ms))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+""" UCT over a compact struct-of-arrays tree.
+
+    Instead of one Node object per position, the tree is a set of preallocated typed
+    columns indexed by node number (node 0 is the root):
+
+        visits, wins        statistics, wins from the viewpoint of playerJustMoved
+        move                square x*size+y of the move leading to the node (-1 for the root)
+        parent              index of the parent node (-1 for the root)
+        firstChild          index of the first child, -1 while the node is not expanded
+        numChildren         number of children, stored contiguously from firstChild
+        tried               children already visited; the moves are shuffled on expansion,
+                            so the untried ones are firstChild+tried .. firstChild+numChildren-1
+        playerJustMoved     as in Node
+
+    A node is expanded (all its children allocated at once) the first time the search
+    descends through it. When the node budget is used up, leaves are no longer expanded
+    and the search keeps refining the nodes it has.
+
+    Because siblings are contiguous, UCB1 selection is one pass over a slice of the
+    wins/visits columns, done as a NumPy argmax over zero-copy views when numpy is installed
+    and the node has at least VECTOR_MIN children.
+"""
+import random
+import time
+from array import array
+from math import log, sqrt
+from UCT import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VECTOR_MIN = 32 # below this many children the plain loop beats numpy's per-call overhead
+
+COLUMNS = [("visits", "i"), ("wins", "d"), ("move", "h"), ("parent", "i"), ("firstChild", "i"),
+           ("numChildren", "h"), ("tried", "h"), ("playerJustMoved", "b")]
+
+class ArrayTree:
+    """ A search tree of at most `capacity` nodes stored in typed arrays.
+    """
+    def __init__(self, rootstate, capacity = 1000000):
+        self.capacity = capacity
+        self.boardSize = rootstate.size
+        for (name, code) in COLUMNS:
+            setattr(self, name, array(code, bytes(array(code).itemsize * capacity)))
+        self.size = 1 # nodes in use
+        self.move[0] = -1
+        self.parent[0] = -1
+        self.firstChild[0] = -1
+        self.playerJustMoved[0] = rootstate.playerJustMoved
+        if np is not None: # views sharing memory with the arrays
+            self.npVisits = np.frombuffer(self.visits, dtype = np.int32)
+            self.npWins = np.frombuffer(self.wins, dtype = np.float64)
+
+    @staticmethod
+    def BytesPerNode():
+        return sum(array(code).itemsize for (name, code) in COLUMNS)
+
+    def Expand(self, node, state):
+        """ Allocate the children of node for the legal moves in state, in random order.
+            Return False if the node budget does not allow it.
+        """
+        moves = state.GetMoves()
+        first = self.size
+        if first + len(moves) > self.capacity:
+            return False
+        random.shuffle(moves)
+        sz = self.boardSize
+        pjm = 3 - state.playerJustMoved
+        for (i, (x, y)) in enumerate(moves, first):
+            self.move[i] = x*sz + y
+            self.parent[i] = node
+            self.firstChild[i] = -1
+            self.playerJustMoved[i] = pjm
+        self.firstChild[node] = first
+        self.numChildren[node] = len(moves)
+        self.size += len(moves)
+        return True
+
+    def UCTSelectChild(self, node, UCTK = 1.0):
+        """ UCB1 child selection over the contiguous children of a fully tried node.
+        """
+        first = self.firstChild[node]
+        n = self.numChildren[node]
+        k = UCTK * sqrt(2*log(self.visits[node]))
+        if np is not None and n >= VECTOR_MIN:
+            v = self.npVisits[first:first+n]
+            return first + int(np.argmax(self.npWins[first:first+n]/v + k/np.sqrt(v)))
+        best, bestValue = -1, -1.0
+        for (c, w, v) in zip(range(first, first + n), self.wins[first:first+n], self.visits[first:first+n]):
+            v = w/v + k/sqrt(v)
+            if v > bestValue:
+                best, bestValue = c, v
+        return best
+
+    def Move(self, node):
+        return divmod(self.move[node], self.boardSize)
+
+    def Children(self, node):
+        first = self.firstChild[node]
+        return range(first, first + self.numChildren[node]) if first >= 0 else range(0)
+
+    def RootStats(self):
+        """ [(move, wins, visits)] of the visited children of the root, as UCT.RootStats.
+        """
+        return [(self.Move(c), self.wins[c], self.visits[c]) for c in self.Children(0) if self.visits[c]]
+
+def ArrayUCTSearch(rootstate, itermax, capacity = 1000000, tree = None, info = None, uctk = UCTK):
+    """ Run itermax UCT iterations from rootstate on an ArrayTree and return the tree.
+    """
+    start = time.time()
+    if tree is None:
+        tree = ArrayTree(rootstate, capacity)
+    visits, wins, parent = tree.visits, tree.wins, tree.parent
+    done = 0
+    for i in range(itermax):
+        node = 0
+        state = rootstate.Clone()
+
+        # Select / Expand
+        while True:
+            if tree.firstChild[node] < 0 and not tree.Expand(node, state):
+                break # 节点数已满，不再扩展，从这里直接模拟
+            n = tree.numChildren[node]
+            if n == 0:
+                break # terminal
+            if tree.tried[node] < n:
+                child = tree.firstChild[node] + tree.tried[node]
+                tree.tried[node] += 1
+                state.DoMove(tree.Move(child))
+                node = child
+                break
+            node = tree.UCTSelectChild(node, uctk)
+            state.DoMove(tree.Move(node))
+
+        # Rollout
+        while state.HasMoves():
+            state.DoMove(state.GetRandomMove())
+
+        # Backpropagate
+        while node >= 0:
+            visits[node] += 1
+            wins[node] += state.GetResult(tree.playerJustMoved[node])
+            node = parent[node]
+        done += 1
+
+    if info is not None:
+        info.iterations += done
+        info.elapsed += time.time() - start
+    return tree
+
+def ArrayUCT(rootstate, itermax, capacity = 1000000, info = None, endgame = ENDGAME_EMPTIES, uctk = UCTK):
+    """ UCT() on an ArrayTree with a budget of `capacity` nodes. Return the best move from the rootstate.
+    """
+    proven = EndgameMove(rootstate, endgame, info)
+    if proven is not None:
+        return proven
+    corner = CornerMove(rootstate)
+    if corner is not None:
+        return corner
+    tree = ArrayUCTSearch(rootstate, itermax, capacity, info = info, uctk = uctk)
+    return BestMove(rootstate, tree.RootStats())
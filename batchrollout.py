@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+""" Batched random playouts for the UCT simulation phase.
+
+    N independent games are played at once. Each game is a pair of uint64 bitboards
+    (same layout as BitboardState: square (x,y) is bit x*8+y), and legal-move generation,
+    move choice and flips are computed for the whole batch with NumPy array operations.
+    Requires numpy; UCT.py only imports this module when rollout="batch" is asked for.
+"""
+import random
+import numpy as np
+from UCT import StateBits
+
+SIZE = 8
+
+_U = np.uint64
+_FULL = _U(0xFFFFFFFFFFFFFFFF)
+_COL0 = sum(1 << (x*SIZE) for x in range(SIZE))
+_COLN = _COL0 << (SIZE-1)
+_DIRS = []
+for (dx,dy) in [(0,+1),(+1,+1),(+1,0),(+1,-1),(0,-1),(-1,-1),(-1,0),(-1,+1)]:
+    mask = (1 << 64) - 1
+    if dy == +1: mask &= ~_COL0
+    if dy == -1: mask &= ~_COLN
+    s = dx*SIZE + dy
+    _DIRS.append((s > 0, _U(abs(s)), _U(mask)))
+del dx, dy, mask, s
+
+def _shift(b, left, s, mask):
+    return ((b << s) if left else (b >> s)) & mask
+
+def _popcount(b):
+    """ Per-element popcount of a uint64 array.
+    """
+    return np.unpackbits(b.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+def MoveMasks(own, opp):
+    """ Legal-move bitmask of every game in the batch for the side owning `own`.
+    """
+    empty = ~(own | opp)
+    moves = np.zeros_like(own)
+    for (left, s, mask) in _DIRS:
+        t = _shift(own, left, s, mask) & opp
+        for _ in range(SIZE-3):
+            t |= _shift(t, left, s, mask) & opp
+        moves |= _shift(t, left, s, mask) & empty
+    return moves
+
+def FlipMasks(m, own, opp):
+    """ Discs flipped in every game when the side owning `own` plays the single-bit move `m`.
+        Games with m == 0 flip nothing.
+    """
+    flips = np.zeros_like(own)
+    for (left, s, mask) in _DIRS:
+        t = _shift(m, left, s, mask) & opp
+        for _ in range(SIZE-3):
+            t |= _shift(t, left, s, mask) & opp
+        bounded = (_shift(t, left, s, mask) & own) != 0
+        flips |= np.where(bounded, t, _U(0))
+    return flips
+
+def PickRandomBits(moves, rng):
+    """ Choose one set bit uniformly at random from each mask (0 where the mask is empty).
+    """
+    bits = np.unpackbits(moves.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    counts = bits.sum(axis=1)
+    k = (rng.random(len(moves)) * counts).astype(np.int64)
+    idx = (np.cumsum(bits, axis=1) > k[:, None]).argmax(axis=1)
+    return np.where(counts > 0, _U(1) << idx.astype(np.uint64), _U(0))
+
+def PlayBatch(b1, b2, toMove, rng):
+    """ Play random games to the end for arrays of positions. toMove holds the player
+        (1 or 2) to move in each game. As in UCT(), a game ends as soon as the side to
+        move has no legal move. Returns the final (b1, b2) arrays.
+    """
+    mover = np.where(toMove == 1, b1, b2)
+    other = np.where(toMove == 1, b2, b1)
+    toMove = toMove.copy()
+    while True:
+        moves = MoveMasks(mover, other)
+        active = moves != 0
+        if not active.any():
+            break
+        m = PickRandomBits(moves, rng)
+        f = FlipMasks(m, mover, other)
+        mover, other = (np.where(active, other & ~f, mover),
+                        np.where(active, mover | f | m, other))
+        toMove = np.where(active, 3 - toMove, toMove)
+    return np.where(toMove == 1, mover, other), np.where(toMove == 1, other, mover)
+
+def Scores(b1, b2):
+    """ Result of each finished game from player 1's viewpoint: 1.0 win, 0.0 loss, 0.5 draw.
+    """
+    c1 = _popcount(b1).astype(np.int64)
+    c2 = _popcount(b2).astype(np.int64)
+    return np.where(c1 > c2, 1.0, np.where(c2 > c1, 0.0, 0.5))
+
+def RolloutMany(states, n, rng = None):
+    """ Run n random playouts from each state in one batch.
+        Returns a list with the mean result of each state from player 1's viewpoint.
+    """
+    assert all(s.size == SIZE for s in states)
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    b1 = np.empty(len(states)*n, dtype=np.uint64)
+    b2 = np.empty(len(states)*n, dtype=np.uint64)
+    toMove = np.empty(len(states)*n, dtype=np.int64)
+    for i, s in enumerate(states):
+        (p1, p2) = StateBits(s)
+        b1[i*n:(i+1)*n] = p1
+        b2[i*n:(i+1)*n] = p2
+        toMove[i*n:(i+1)*n] = 3 - s.playerJustMoved
+    (b1, b2) = PlayBatch(b1, b2, toMove, rng)
+    return Scores(b1, b2).reshape(len(states), n).mean(axis=1).tolist()
+
+def BatchRollout(state, n, rng = None):
+    """ Mean result of n random playouts from state, from player 1's viewpoint.
+    """
+    return RolloutMany([state], n, rng)[0]
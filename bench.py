@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+""" Throughput measurements for the hot paths of the engine.
+
+    python bench.py            # random playouts/sec, per engine
+    python bench.py parallel   # root- and tree-parallel UCT iterations/sec from 1 to cpu_count workers
+    python bench.py memory     # bytes per visited tree node and tree size in a RAM cap, per tree layout
+    python bench.py select     # UCB1 child selection: sort-based vs single pass vs arrays
+    python bench.py suite [out.json]                # perft checks and hot-path rates, as JSON
+    python bench.py compare base.json [new.json]    # flag rates that dropped against a saved run
+    python bench.py sizes      # move generation and playouts/sec on 6x6 up to 16x16 boards, per engine
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import UCT
+from UCT import *
+
+def LoopPlayouts(engine, seconds = 2.0, sz = 8):
+    """ Random playouts/sec of the rollout loop used by UCT(), one game at a time.
+    """
+    start = time.time()
+    n = 0
+    while time.time() - start < seconds:
+        state = MakeState(sz, engine)
+        while state.HasMoves():
+            state.DoMove(state.GetRandomMove())
+        n += 1
+    return n / (time.time() - start)
+
+def BatchPlayouts(batch = 256, seconds = 2.0):
+    """ Random playouts/sec of the NumPy batched engine, `batch` games per call.
+    """
+    from batchrollout import BatchRollout
+    state = MakeState()
+    start = time.time()
+    n = 0
+    while time.time() - start < seconds:
+        BatchRollout(state, batch)
+        n += batch
+    return n / (time.time() - start)
+
+def PlayoutReport(seconds = 2.0):
+    """ Return {name: playouts/sec} for every rollout engine available here.
+    """
+    report = {}
+    for engine in STATE_ENGINES:
+        report["loop-" + engine] = LoopPlayouts(engine, seconds)
+    try:
+        import numpy
+    except ImportError:
+        print("numpy not installed, skipping batched playouts")
+    else:
+        for batch in (16, 256, 4096):
+            report["batch-%d" % batch] = BatchPlayouts(batch, seconds)
+    return report
+
+def ParallelScaling(itermax = 2000, maxworkers = None, engine = "bitboard", mode = "root"):
+    """ Return {workers: iterations/sec} of ParallelUCT (mode "root", each worker running
+        itermax iterations) or TreeParallelSearch (mode "tree", workers*itermax iterations
+        on one tree, 8 leaves per task) for 1..maxworkers processes. Pool start-up is not timed.
+    """
+    from parallel import ParallelRootStats, TreeParallelSearch
+    state = MakeState(engine = engine)
+    report = {}
+    for workers in range(1, (maxworkers or os.cpu_count() or 1) + 1):
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            ParallelRootStats(state, 1, workers, seed = 0, executor = pool) # warm up the workers
+            start = time.time()
+            if mode == "tree":
+                TreeParallelSearch(state, workers * itermax, workers, batch = 8, seed = 0, executor = pool)
+            else:
+                ParallelRootStats(state, itermax, workers, seed = 0, executor = pool)
+            report[workers] = workers * itermax / (time.time() - start)
+    return report
+
+def _PlainNodeClass():
+    """ Node without __slots__, i.e. with a per-instance __dict__ as it used to be.
+    """
+    ns = dict((k, v) for (k, v) in Node.__dict__.items() if k not in Node.__slots__ and k != "__slots__")
+    return type("Node", (), ns)
+
+def _TreeBytesPerNode(iterations, plain = False):
+    """ Traced bytes per node of a UCTSearch tree (nodes, child lists, untried move lists).
+    """
+    state = MakeState(engine = "bitboard")
+    if plain:
+        UCT.Node = _PlainNodeClass()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        rootnode = UCTSearch(state, iterations)
+        used = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+        UCT.Node = Node
+    count, stack = 0, [rootnode]
+    while stack:
+        n = stack.pop()
+        count += 1
+        stack.extend(n.childNodes)
+    return used / count
+
+def _ArrayBytesPerNode(iterations):
+    """ Bytes of the allocated ArrayTree slots per visited node. Expand allocates a slot for
+        every child at once, so there are more slots than nodes the search has visited; a
+        UCTSearch Node is only created when it is visited.
+    """
+    from arraytree import ArrayTree, ArrayUCTSearch
+    tree = ArrayUCTSearch(MakeState(engine = "bitboard"), iterations, capacity = 64 * iterations)
+    visited = sum(1 for i in range(tree.size) if tree.visits[i] > 0)
+    return tree.size * ArrayTree.BytesPerNode() / visited
+
+def MemoryReport(iterations = 1000, capmb = 1024):
+    """ Return {layout: (bytes per visited node, visited nodes that fit in capmb MiB)}.
+    """
+    cap = capmb * 1024 * 1024
+    report = {}
+    for (name, per) in [("Node (__dict__)", _TreeBytesPerNode(iterations, plain = True)),
+                        ("Node (__slots__)", _TreeBytesPerNode(iterations)),
+                        ("ArrayTree", _ArrayBytesPerNode(iterations))]:
+        report[name] = (per, int(cap / per))
+    return report
+
+def _SortSelect(node):
+    """ The original sort-based UCTSelectChild, for comparison.
+    """
+    return sorted(node.childNodes, key = lambda c: c.wins/c.visits + sqrt(2*log(node.visits)/c.visits))[-1]
+
+def SelectReport(sizes = (4, 10, 20, 30), reps = 20000):
+    """ Return {(method, children): microseconds per selection}.
+    """
+    import arraytree
+    from arraytree import ArrayTree
+    state = MakeState()
+    report = {}
+    for k in sizes:
+        root = Node(state = state)
+        tree = ArrayTree(state, k + 1)
+        tree.firstChild[0] = 1
+        tree.numChildren[0] = k
+        for i in range(k):
+            c = Node(move = (i, 0), parent = root, state = state)
+            c.visits = random.randint(1, 100)
+            c.wins = random.random() * c.visits
+            root.childNodes.append(c)
+            tree.visits[i+1] = c.visits
+            tree.wins[i+1] = c.wins
+        root.visits = tree.visits[0] = sum(c.visits for c in root.childNodes)
+        methods = [("sort", lambda: _SortSelect(root)),
+                   ("single-pass", lambda: root.UCTSelectChild()),
+                   ("array-loop", lambda: tree.UCTSelectChild(0))]
+        if arraytree.np is not None:
+            methods.append(("array-numpy", lambda: tree.UCTSelectChild(0)))
+        vectorMin = arraytree.VECTOR_MIN
+        for (name, f) in methods:
+            arraytree.VECTOR_MIN = 0 if name == "array-numpy" else 1 << 30
+            start = time.time()
+            for i in range(reps):
+                f()
+            report[(name, k)] = (time.time() - start) / reps * 1e6
+        arraytree.VECTOR_MIN = vectorMin
+    return report
+
+## perft: number of leaf positions `depth` plies ahead, a pass counting as a ply
+PERFT_POSITIONS = [
+    ("start", "", [4, 12, 56, 244, 1396, 8200, 55092]),
+    ("opening", "d3 e3 f6 c4 b5 g7 f4 g3 g4 c3 e6 b4 g2 a6 g6 f5 h8 c6 g5 h7", [7, 86, 917, 11487]),
+    ("midgame", "c4 c5 b6 c3 c2 b2 e6 c1 e3 c6 b3 a4 b5 f3 g3 f5 d6 g2 h1 e7 f7 a5 a6 e2 e8 d3 f4 f2 g6 b4",
+     [8, 114, 1053, 15055]),
+    ("endgame", "d3 e3 f2 c5 e6 g1 c3 f3 b5 c2 c1 e7 f5 c6 e2 b3 c7 g4 g5 f1 g3 h5 e8 h3 c4 b6 a4 d8 d2 a6 "
+     "a5 b7 g2 a3 b4 b1 b8 f8 f4 e1 d1 h1 h6 d6", [10, 65, 590, 3639]),
+]
+
+def Position(moves, engine = "list"):
+    """ The position after a space separated move list in the GUI's notation ("d3" = (3, 5)).
+    """
+    state = MakeState(engine = engine)
+    for m in moves.split():
+        state.DoMove((ord(m[0]) - ord("a"), state.size - int(m[1:])))
+    return state
+
+def Perft(state, depth, passed = False):
+    """ Count the leaves of the game tree `depth` plies below state, walking it with DoMove/UndoMove.
+    """
+    if depth == 0:
+        return 1
+    moves = state.GetMoves()
+    if moves == []:
+        if passed: # neither side can move: the game is over
+            return 1
+        state.playerJustMoved = 3 - state.playerJustMoved
+        n = Perft(state, depth - 1, True)
+        state.playerJustMoved = 3 - state.playerJustMoved
+        return n
+    n = 0
+    for m in moves:
+        state.DoMove(m)
+        n += Perft(state, depth - 1)
+        state.UndoMove()
+    return n
+
+def PerftReport(engine, maxdepth = 6):
+    """ {position: {"counts", "ok", "nodes_per_s"}}; ok is False if a count differs from PERFT_POSITIONS.
+    """
+    report = {}
+    for (name, moves, expected) in PERFT_POSITIONS:
+        state = Position(moves, engine)
+        start = time.time()
+        counts = [Perft(state, d) for d in range(1, min(maxdepth, len(expected)) + 1)]
+        report[name] = {"counts": counts, "ok": counts == expected[:len(counts)],
+                        "nodes_per_s": sum(counts) / (time.time() - start)}
+    return report
+
+def _Rate(f, seconds):
+    start = time.time()
+    n = 0
+    while time.time() - start < seconds:
+        f()
+        n += 1
+    return n / (time.time() - start)
+
+def StateRates(engine, seconds = 1.0):
+    """ GetMoves, DoMove+UndoMove and Clone calls/sec in the "midgame" position. GetMoves is
+        timed with the move cache cleared, so that every call generates the moves.
+    """
+    state = Position(PERFT_POSITIONS[2][1], engine)
+    m = state.GetMoves()[0]
+    def GenMoves():
+        state.moveCache = None
+        state.GetMoves()
+    def DoUndo():
+        state.DoMove(m)
+        state.UndoMove()
+    return {"GetMoves": _Rate(GenMoves, seconds), "DoMove+UndoMove": _Rate(DoUndo, seconds),
+            "Clone": _Rate(state.Clone, seconds)}
+
+def SearchRates(engine, sizes = (100, 1000, 4000)):
+    """ {iterations: UCTSearch iterations/sec} from the starting position, for trees of growing size.
+    """
+    report = {}
+    for itermax in sizes:
+        random.seed(itermax)
+        info = SearchInfo()
+        UCTSearch(MakeState(engine = engine), itermax, info = info)
+        report[str(itermax)] = info.iterations / info.elapsed
+    return report
+
+def SuiteReport(seconds = 1.0):
+    """ The full suite as a JSON-ready dict. Keys ending in "_per_s" are rates (higher is better).
+    """
+    report = {"perft": {}, "rates": {}}
+    for engine in STATE_ENGINES:
+        report["perft"][engine] = PerftReport(engine, maxdepth = 6 if engine == "bitboard" else 4)
+        rates = report["rates"][engine] = {}
+        for (name, r) in StateRates(engine, seconds).items():
+            rates[name + "_per_s"] = r
+        rates["playouts_per_s"] = LoopPlayouts(engine, seconds)
+        for (size, r) in SearchRates(engine).items():
+            rates["uct_%s_iterations_per_s" % size] = r
+    return report
+
+def SizePosition(sz, engine, plies = None, seed = 0):
+    """ A reproducible position `plies` random moves (default: a third of the board) from the start.
+    """
+    rng = random.Random(seed)
+    state = MakeState(sz, engine)
+    for i in range((sz*sz - 4) // 3 if plies is None else plies):
+        if not state.HasMoves():
+            break
+        state.DoMove(rng.choice(state.GetMoves()))
+    return state
+
+def SizeReport(sizes = (6, 8, 10, 12, 16), seconds = 1.0, depth = 3):
+    """ {size: {"perft", "ok", engine: rates}} for boards of each size, all measured in SizePosition
+        except the playouts, which start from the initial position. perft counts the leaves up to
+        `depth` plies deep and ok tells whether both engines agree on them; the move generation
+        rate is taken with the move cache cleared, so that every call generates.
+    """
+    report = {}
+    for sz in sizes:
+        counts = dict((engine, [Perft(SizePosition(sz, engine), d) for d in range(1, depth + 1)]) for engine in STATE_ENGINES)
+        entry = report[str(sz)] = {"perft": counts["bitboard"], "ok": len(set(map(tuple, counts.values()))) == 1}
+        for engine in STATE_ENGINES:
+            state = SizePosition(sz, engine)
+            m = state.GetMoves()[0]
+            def GenMoves():
+                state.moveCache = None
+                state.GetMoves()
+            def DoUndo():
+                state.DoMove(m)
+                state.UndoMove()
+            entry[engine] = {"GetMoves_per_s": _Rate(GenMoves, seconds), "DoMove+UndoMove_per_s": _Rate(DoUndo, seconds),
+                             "playouts_per_s": LoopPlayouts(engine, seconds, sz)}
+    return report
+
+def _Flatten(d, prefix = ""):
+    flat = {}
+    for (k, v) in d.items():
+        if isinstance(v, dict):
+            flat.update(_Flatten(v, prefix + k + "/"))
+        else:
+            flat[prefix + k] = v
+    return flat
+
+def CompareReports(base, new, tolerance = 0.10):
+    """ Return a list of (key, base, new, problem) for perft failures and for rates that
+        dropped by more than `tolerance` against base.
+    """
+    (base, new) = (_Flatten(base), _Flatten(new))
+    problems = []
+    for (key, value) in sorted(new.items()):
+        if key.endswith("/ok") and not value:
+            problems.append((key, base.get(key), value, "perft mismatch"))
+        elif key.endswith("_per_s") and key in base and value < base[key] * (1 - tolerance):
+            problems.append((key, base[key], value, "%.0f%% slower" % (100 * (1 - value / base[key]))))
+    return problems
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["suite"]:
+        text = json.dumps(SuiteReport(), indent = 1, sort_keys = True)
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        if not all(p["ok"] for e in json.loads(text)["perft"].values() for p in e.values()):
+            sys.exit("perft mismatch")
+    elif sys.argv[1:2] == ["compare"] and len(sys.argv) > 2:
+        with open(sys.argv[2]) as f:
+            base = json.load(f)
+        if len(sys.argv) > 3:
+            with open(sys.argv[3]) as f:
+                new = json.load(f)
+        else:
+            new = SuiteReport()
+        problems = CompareReports(base, new)
+        for (key, old, value, problem) in problems:
+            print("%-50s %12s -> %12s  %s" % (key, old, value, problem))
+        if problems:
+            sys.exit(1)
+        print("no regressions")
+    elif sys.argv[1:] == ["select"]:
+        for (name, k), us in SelectReport().items():
+            print("%-12s %3d children %8.2f us/select" % (name, k, us))
+    elif sys.argv[1:] == ["memory"]:
+        for name, (per, nodes) in MemoryReport().items():
+            print("%-18s %8.1f bytes/visited node %12d visited nodes in 1 GiB" % (name, per, nodes))
+    elif sys.argv[1:] == ["sizes"]:
+        report = SizeReport()
+        for (sz, entry) in report.items():
+            for engine in STATE_ENGINES:
+                r = entry[engine]
+                print("%2sx%-2s %-9s %10.0f GetMoves/s %10.0f DoMove+UndoMove/s %8.1f playouts/s" % (sz, sz, engine,
+                      r["GetMoves_per_s"], r["DoMove+UndoMove_per_s"], r["playouts_per_s"]))
+            print("%2sx%-2s perft %s %s" % (sz, sz, entry["perft"], "ok" if entry["ok"] else "ENGINES DISAGREE"))
+        if not all(entry["ok"] for entry in report.values()):
+            sys.exit("perft mismatch")
+    elif sys.argv[1:] == ["parallel"]:
+        for mode in ("root", "tree"):
+            report = ParallelScaling(mode = mode)
+            for workers, rate in report.items():
+                print("%s %2d workers %10.1f iterations/s  x%.2f" % (mode, workers, rate, rate / report[1]))
+    else:
+        report = PlayoutReport()
+        base = report["loop-list"]
+        for name, rate in report.items():
+            print("%-14s %10.1f playouts/s  x%.1f" % (name, rate, rate / base))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+""" Opening book: precomputed moves for early positions, read through mmap.
+
+    python book.py --plies 6 --iterations 20000 --out book.bin    # build it offline
+
+    Every position is reduced to a canonical form under the 8 symmetries of the board
+    (rotations and reflections, see CanonicalHash in UCT.py). The file is
+
+        header      "OBK1", board size (uint16), number of records (uint32)
+        records     sorted by key: key (uint64), move square x*size+y (uint16),
+                    score (uint16, search win rate of the move * 65535)
+
+    with the move given in the canonical orientation. OpeningBook maps the file and finds a
+    position by binary search over the records, so opening a book parses nothing and
+    only the pages touched by lookups are read.
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from UCT import *
+
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+MAGIC = b"OBK1"
+HEADER = struct.Struct("<4sHI")
+RECORD = struct.Struct("<QHH")
+
+class OpeningBook:
+    """ Read-only view of a book file. Lookup(state) returns the book move or None.
+    """
+    def __init__(self, path = DEFAULT_BOOK):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        (magic, self.size, self.count) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not an opening book" % path)
+
+    def Find(self, key):
+        """ (move square, score) stored for key, or None.
+        """
+        (lo, hi) = (0, self.count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (k, square, score) = RECORD.unpack_from(self.data, HEADER.size + mid*RECORD.size)
+            if k == key:
+                return (square, score)
+            elif k < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def Lookup(self, state):
+        """ The book move for state in state's own orientation, or None if the position
+            is not in the book (or the stored move is not legal there, i.e. a hash collision).
+        """
+        if state.size != self.size:
+            return None
+        (key, k) = state.CanonicalHash()
+        found = self.Find(key)
+        if found is None:
+            return None
+        move = Transform(divmod(found[0], self.size), INVERSE[k], self.size)
+        return move if move in state.GetMoves() else None
+
+    def __len__(self):
+        return self.count
+
+    def Close(self):
+        self.data.close()
+
+def OpenBook(path = DEFAULT_BOOK):
+    """ OpeningBook(path), or None if there is no book file.
+    """
+    return OpeningBook(path) if os.path.exists(path) else None
+
+def BookPositions(plies, sz = 8, engine = "bitboard"):
+    """ One representative state per canonical position reachable in at most `plies` moves
+        from the start (passes included), in order of depth.
+    """
+    seen = set()
+    positions = []
+    frontier = [MakeState(sz, engine)]
+    for ply in range(plies + 1):
+        following = []
+        for state in frontier:
+            if not state.HasMoves():
+                state = state.Clone()
+                state.playerJustMoved = 3 - state.playerJustMoved # pass
+                if not state.HasMoves():
+                    continue
+            key = state.CanonicalHash()[0]
+            if key in seen:
+                continue
+            seen.add(key)
+            positions.append(state)
+            for m in state.GetMoves():
+                child = state.Clone()
+                child.DoMove(m)
+                following.append(child)
+        frontier = following
+    return positions
+
+def _BookEntry(state, iterations, seed):
+    """ Search one position deeply (no corner heuristics, those are for play) and return its record.
+    """
+    random.seed(seed)
+    rootnode = UCTSearch(state, iterations)
+    (move, wins, visits) = max(RootStats(rootnode), key = lambda c: c[2])
+    (key, k) = state.CanonicalHash()
+    (x, y) = Transform(move, k, state.size)
+    return (key, x*state.size + y, int(65535 * wins / visits))
+
+def BuildBook(path, plies = 6, iterations = 20000, sz = 8, workers = None, seed = 0):
+    """ Search every canonical position up to `plies` moves deep and write the book file.
+        Return the number of records.
+    """
+    positions = BookPositions(plies, sz)
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        records = list(pool.map(_BookEntry, positions, [iterations]*len(positions),
+                                range(seed, seed + len(positions))))
+    records.sort()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, sz, len(records)))
+        for r in records:
+            f.write(RECORD.pack(*r))
+    return len(records)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Build an opening book by deep self-play searches")
+    parser.add_argument("--plies", type = int, default = 6, help = "book depth in moves from the start")
+    parser.add_argument("--iterations", type = int, default = 20000, help = "UCT iterations per position")
+    parser.add_argument("--size", type = int, default = 8)
+    parser.add_argument("--workers", type = int, default = None, help = "search processes (default: cpu count)")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--out", default = DEFAULT_BOOK)
+    args = parser.parse_args(argv)
+    n = BuildBook(args.out, args.plies, args.iterations, args.size, args.workers, args.seed)
+    print("%d positions written to %s" % (n, args.out))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+""" Exact endgame solver.
+
+    Negamax with alpha-beta over the bitboards of the position, with the full rules
+    (a side without a legal move passes, the game ends when neither side can move).
+    Scores are final disc differences from the viewpoint of the player to move.
+    Moves are ordered by region parity and by how few replies they leave the opponent,
+    and every solved position is kept as a (lower, upper) bound in a cache.
+"""
+from UCT import BitMoves, BitFlips, StateBits, _popcount
+
+ORDER_MIN = 5 # below this many empties moves are searched in parity order only
+
+_QUADRANTS = {}
+def Quadrants(sz):
+    """ Masks of the four board quadrants, the regions used for parity ordering.
+    """
+    if sz not in _QUADRANTS:
+        q = [0, 0, 0, 0]
+        for x in range(sz):
+            for y in range(sz):
+                q[(x >= sz//2)*2 + (y >= sz//2)] |= 1 << (x*sz+y)
+        _QUADRANTS[sz] = q
+    return _QUADRANTS[sz]
+
+def MoverBits(state):
+    """ (bits of the player to move, bits of the opponent) of an OthelloState or BitboardState.
+    """
+    bits = StateBits(state)
+    return (bits[0], bits[1]) if state.playerJustMoved == 2 else (bits[1], bits[0])
+
+class EndgameSolver:
+    """ Solves positions exactly. One solver can be reused across searches and moves,
+        its cache of solved positions is cleared when it grows past cachesize.
+    """
+    def __init__(self, sz = 8, cachesize = 1 << 20):
+        self.size = sz
+        self.full = (1 << (sz*sz)) - 1
+        self.quadrants = Quadrants(sz)
+        self.cachesize = cachesize
+        self.cache = {} # (own, opp) -> (lower bound, upper bound)
+        self.nodes = 0
+
+    def Solve(self, state):
+        """ Return (best move, score) for the player to move in state, score being the final
+            disc difference with perfect play by both sides. The move is None if the player
+            to move has to pass.
+        """
+        assert state.size == self.size
+        (own, opp) = MoverBits(state)
+        moves = BitMoves(own, opp, self.size)
+        if not moves:
+            return None, self.Negamax(own, opp, -self.full, self.full)
+        best, bestmove = None, None
+        alpha = -(self.size*self.size) - 1
+        for m in self.Ordered(own, opp, moves):
+            f = BitFlips(own, opp, m, self.size)
+            v = -self.Negamax(opp & ~f, own | f | m, -(self.size*self.size) - 1, -alpha)
+            if best is None or v > best:
+                best, bestmove = v, m
+                alpha = max(alpha, v)
+        return divmod(bestmove.bit_length() - 1, self.size), best
+
+    def Result(self, state, playerjm):
+        """ Exact game result from the viewpoint of playerjm, 1.0 win, 0.0 loss, 0.5 draw,
+            found with a null window around zero (cheaper than the exact score).
+        """
+        (own, opp) = MoverBits(state)
+        v = self.Negamax(own, opp, -1, 1)
+        if playerjm != 3 - state.playerJustMoved:
+            v = -v
+        return 1.0 if v > 0 else 0.0 if v < 0 else 0.5
+
+    def Ordered(self, own, opp, moves):
+        """ The single-bit moves of the mask, best first: fewest opponent replies, then odd regions.
+        """
+        empty = ~(own | opp) & self.full
+        odd = 0
+        for q in self.quadrants:
+            if _popcount(empty & q) & 1:
+                odd |= q
+        out = []
+        while moves:
+            m = moves & -moves
+            moves ^= m
+            out.append(m)
+        if _popcount(empty) < ORDER_MIN:
+            out.sort(key = lambda m: not (m & odd))
+        else:
+            sz = self.size
+            def key(m):
+                f = BitFlips(own, opp, m, sz)
+                return (_popcount(BitMoves(opp & ~f, own | f | m, sz)), not (m & odd))
+            out.sort(key = key)
+        return out
+
+    def Negamax(self, own, opp, alpha, beta):
+        """ Fail-soft alpha-beta value of the position for the side owning `own`.
+        """
+        self.nodes += 1
+        key = (own, opp)
+        bounds = self.cache.get(key)
+        if bounds is not None:
+            (lo, hi) = bounds
+            if lo >= beta: return lo
+            if hi <= alpha: return hi
+            if lo == hi: return lo
+            alpha = max(alpha, lo)
+            beta = min(beta, hi)
+        else:
+            (lo, hi) = (-self.full, self.full)
+        moves = BitMoves(own, opp, self.size)
+        if not moves:
+            if not BitMoves(opp, own, self.size): # neither side can move: game over
+                v = _popcount(own) - _popcount(opp)
+                self.Store(key, v, v)
+                return v
+            return -self.Negamax(opp, own, -beta, -alpha) # pass
+        a0 = alpha
+        best = -self.full
+        for m in self.Ordered(own, opp, moves):
+            f = BitFlips(own, opp, m, self.size)
+            v = -self.Negamax(opp & ~f, own | f | m, -beta, -alpha)
+            if v > best:
+                best = v
+                if v > alpha:
+                    alpha = v
+                    if alpha >= beta:
+                        break
+        if best <= a0:
+            self.Store(key, lo, min(hi, best))
+        elif best >= beta:
+            self.Store(key, max(lo, best), hi)
+        else:
+            self.Store(key, best, best)
+        return best
+
+    def Store(self, key, lo, hi):
+        if len(self.cache) >= self.cachesize:
+            self.cache.clear()
+        self.cache[key] = (lo, hi)
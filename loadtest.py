@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+""" Load-test client for server.py in TCP mode.
+
+    python server.py --tcp 7777 &
+    python loadtest.py --port 7777 --sessions 32 --moves 10 --ms 200
+
+    Every session starts a game and asks for `moves` genmoves (the server plays both
+    sides), and the latency of each genmove request is recorded. Percentiles are
+    reported over all requests of all sessions.
+"""
+import argparse
+import asyncio
+import time
+
+async def Request(reader, writer, line):
+    """ Send one command and return the reply text (without the "= " and the blank line).
+    """
+    writer.write((line + "\n").encode("utf-8"))
+    await writer.drain()
+    lines = []
+    while True:
+        l = (await reader.readline()).decode("utf-8")
+        if l in ("\n", ""):
+            break
+        lines.append(l.rstrip("\n"))
+    reply = "\n".join(lines)
+    if not reply.startswith("="):
+        raise RuntimeError("%s -> %s" % (line, reply))
+    return reply[2:]
+
+async def Session(host, port, moves, ms, latencies):
+    (reader, writer) = await asyncio.open_connection(host, port)
+    try:
+        await Request(reader, writer, "new")
+        passes = 0
+        for i in range(moves):
+            start = time.time()
+            move = await Request(reader, writer, "genmove %d" % ms)
+            latencies.append(time.time() - start)
+            passes = passes + 1 if move == "pass" else 0
+            if passes == 2: # game over
+                await Request(reader, writer, "new")
+                passes = 0
+        await Request(reader, writer, "quit")
+    finally:
+        writer.close()
+
+def Percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+async def Run(host, port, sessions, moves, ms):
+    latencies = []
+    start = time.time()
+    await asyncio.gather(*[Session(host, port, moves, ms, latencies) for i in range(sessions)])
+    return latencies, time.time() - start
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Load-test the engine server")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 7777)
+    parser.add_argument("--sessions", type = int, default = 16, help = "concurrent games")
+    parser.add_argument("--moves", type = int, default = 10, help = "genmove requests per game")
+    parser.add_argument("--ms", type = int, default = 200, help = "think time per genmove")
+    args = parser.parse_args(argv)
+    (latencies, elapsed) = asyncio.run(Run(args.host, args.port, args.sessions, args.moves, args.ms))
+    print("%d requests in %.2fs (%.1f/s)" % (len(latencies), elapsed, len(latencies) / elapsed))
+    for p in (50, 90, 95, 99, 100):
+        print("p%-3d %8.1f ms" % (p, Percentile(latencies, p) * 1000))
+
+if __name__ == "__main__":
+    main()
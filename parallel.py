@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+""" Parallel UCT.
+
+    Root parallelism (ParallelUCT): every worker process runs an independent UCTSearch from
+    the same root with its own random seed. The root children's wins and visits are summed
+    over the workers and the move is picked from the merged counts with the usual corner
+    heuristics (BestMove).
+
+    Tree parallelism (TreeParallelUCT): one shared tree of Nodes is grown in this process
+    and only the rollouts go to the worker processes. Up to `inflight` leaves are waiting
+    for their rollouts at once; each is charged a virtual loss on its path while it waits,
+    so the next selections spread over other branches instead of piling onto the same
+    one. Results are backpropagated as they come back, in whatever order they finish.
+"""
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from UCT import *
+
+def _SearchWorker(rootstate, itermax, seed, options):
+    """ Run one independent search in a worker process and return its root statistics.
+    """
+    random.seed(seed)
+    rootnode = UCTSearch(rootstate, itermax, **options)
+    return RootStats(rootnode)
+
+def MergeRootStats(results):
+    """ Sum [(move, wins, visits)] lists from several searches, move by move.
+    """
+    merged = {}
+    for stats in results:
+        for (m, w, v) in stats:
+            (mw, mv) = merged.get(m, (0, 0))
+            merged[m] = (mw + w, mv + v)
+    return [(m, w, v) for (m, (w, v)) in sorted(merged.items())]
+
+def ParallelUCT(rootstate, itermax, workers = None, seed = None, executor = None, endgame = ENDGAME_EMPTIES, **options):
+    """ Root-parallel version of UCT(): `workers` processes each run itermax iterations.
+        seed makes the whole search reproducible; worker i is seeded with seed + i.
+        Pass a long-lived ProcessPoolExecutor as executor to avoid starting a pool per move.
+        Other keyword options (rollout, playouts, inplace, exactleaves) are passed to UCTSearch.
+        Return the best move from the rootstate.
+    """
+    proven = EndgameMove(rootstate, endgame)
+    if proven is not None:
+        return proven
+    corner = CornerMove(rootstate)
+    if corner is not None:
+        return corner
+    stats = ParallelRootStats(rootstate, itermax, workers, seed, executor, **options)
+    return BestMove(rootstate, stats)
+
+def ParallelRootStats(rootstate, itermax, workers = None, seed = None, executor = None, **options):
+    """ Run the worker searches of ParallelUCT and return the merged root statistics.
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.getrandbits(32)
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(max_workers = workers)
+    try:
+        futures = [executor.submit(_SearchWorker, rootstate, itermax, seed + i, options) for i in range(workers)]
+        return MergeRootStats([f.result() for f in futures])
+    finally:
+        if own:
+            executor.shutdown()
+
+def _RolloutWorker(states, seed):
+    """ Play random games from each state in a worker process; results from player 1's viewpoint.
+    """
+    random.seed(seed)
+    results = []
+    for state in states:
+        while state.HasMoves():
+            state.DoMove(state.GetRandomMove())
+        results.append(state.GetResult(1))
+    return results
+
+def _SelectLeaf(rootnode, rootstate, virtualloss, uctk, rng):
+    """ Select and expand one leaf as in UCTSearch, adding virtual loss (visits without wins)
+        to every node on the way; rng (a random.Random) picks the move to expand.
+        Return the leaf node and its state.
+    """
+    node = rootnode
+    state = rootstate.Clone()
+    node.visits += virtualloss
+    while node.untriedMoves == [] and node.childNodes != []:
+        node = node.UCTSelectChild(uctk)
+        state.DoMove(node.move)
+        node.visits += virtualloss
+    if node.untriedMoves != []:
+        m = rng.choice(node.untriedMoves)
+        state.DoMove(m)
+        node = node.AddChild(m, state)
+        node.visits += virtualloss
+    return node, state
+
+def _Backpropagate(node, score1, virtualloss):
+    """ Remove the virtual loss from node and its ancestors and add the real result
+        (score1 is from player 1's viewpoint).
+    """
+    while node is not None:
+        node.visits -= virtualloss
+        node.Update(score1 if node.playerJustMoved == 1 else 1.0 - score1)
+        node = node.parentNode
+
+def TreeParallelSearch(rootstate, itermax, workers = None, inflight = None, batch = 1, virtualloss = 1,
+                       seed = None, executor = None, rootnode = None, info = None, uctk = UCTK):
+    """ Run itermax iterations of tree-parallel UCT from rootstate and return the root node.
+        At most `inflight` leaves (default 2 per worker and batch) wait for rollouts at a time,
+        sent to the pool `batch` leaves per task. Pass a long-lived ProcessPoolExecutor as
+        executor to avoid starting a pool per move. virtualloss must be at least 1: a leaf whose
+        rollout is still out has no real visits yet. seed makes tree and rollouts reproducible
+        for a given number of workers, up to the order in which results come back;
+        the global random generator is left alone.
+    """
+    assert virtualloss >= 1, "selection divides by the visits of leaves still waiting for their rollouts"
+    start = time.time()
+    workers = workers or os.cpu_count() or 1
+    inflight = inflight or 2 * workers * batch
+    rng = random.Random(seed)
+    if seed is None:
+        seed = rng.getrandbits(32)
+    if rootnode is None:
+        rootnode = Node(state = rootstate)
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(max_workers = workers)
+    pending = {} # future -> leaves it evaluates
+    waiting = [] # (leaf, state) not yet sent
+    (started, done, tasks) = (0, 0, 0)
+    try:
+        while done < itermax:
+            while started < itermax and started - done < inflight:
+                (node, state) = _SelectLeaf(rootnode, rootstate, virtualloss, uctk, rng)
+                started += 1
+                if not state.HasMoves(): # terminal, nothing to roll out
+                    _Backpropagate(node, state.GetResult(1), virtualloss)
+                    done += 1
+                    continue
+                waiting.append((node, state))
+                if len(waiting) == batch:
+                    future = executor.submit(_RolloutWorker, [s for (n, s) in waiting], seed + tasks)
+                    pending[future] = [n for (n, s) in waiting]
+                    (waiting, tasks) = ([], tasks + 1)
+            if waiting and (started == itermax or started - done >= inflight):
+                ## 凑不满一批时也要送出，否则会一直等待
+                future = executor.submit(_RolloutWorker, [s for (n, s) in waiting], seed + tasks)
+                pending[future] = [n for (n, s) in waiting]
+                (waiting, tasks) = ([], tasks + 1)
+            if not pending:
+                continue
+            (finished, _) = wait(list(pending), return_when = FIRST_COMPLETED)
+            for future in finished:
+                for (node, score1) in zip(pending.pop(future), future.result()):
+                    _Backpropagate(node, score1, virtualloss)
+                    done += 1
+    finally:
+        for future in pending:
+            future.cancel()
+        if own:
+            executor.shutdown()
+    if info is not None:
+        info.iterations += done
+        info.elapsed += time.time() - start
+    return rootnode
+
+def TreeParallelUCT(rootstate, itermax, workers = None, endgame = ENDGAME_EMPTIES, info = None, **options):
+    """ Tree-parallel version of UCT(), see TreeParallelSearch for the options.
+        Return the best move from the rootstate.
+    """
+    proven = EndgameMove(rootstate, endgame, info)
+    if proven is not None:
+        return proven
+    corner = CornerMove(rootstate)
+    if corner is not None:
+        return corner
+    rootnode = TreeParallelSearch(rootstate, itermax, workers, info = info, **options)
+    return BestMove(rootstate, RootStats(rootnode))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+""" A UCTSearcher running in a background thread, for front-ends with their own event loop.
+
+    Requests go in through Play/Think, results come back through Poll, so a Tk mainloop can
+    drive it with root.after polling and never block. While no request is pending and the
+    opponent is to move, the thread keeps growing the tree (pondering). If the opponent then
+    plays the predicted reply, the subtree is already searched and the engine answers after
+    a short top-up search instead of a full think. Pondering stops after ponderLimit
+    iterations per opponent turn, so a long think by the opponent does not grow the tree
+    (one node per iteration) without bound.
+"""
+import queue
+import threading
+from UCT import *
+
+class PonderingEngine(threading.Thread):
+    def __init__(self, searcher, ponderIterations = 64, hitTimeout = 200, ponderLimit = 100000):
+        threading.Thread.__init__(self, daemon = True)
+        self.searcher = searcher
+        self.ponderIterations = ponderIterations # iterations per pondering slice
+        self.ponderLimit = ponderLimit # iterations pondered per opponent turn at most
+        self.pondered = 0
+        self.hitTimeout = hitTimeout # ms to think after a correctly predicted reply
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.ponderState = None # position being pondered, opponent to move
+        self.ponderHit = False
+        self.ponderHits = 0
+
+    def Play(self, move):
+        """ Tell the engine that the opponent played move.
+        """
+        self.requests.put(("play", move))
+
+    def Think(self, state):
+        """ Ask for a move in state; the answer arrives through Poll.
+        """
+        self.requests.put(("think", state.Clone()))
+
+    def Quit(self):
+        self.requests.put(("quit",))
+
+    def Poll(self):
+        """ (move, SearchInfo, ponder hit) for a finished Think, or None if still thinking.
+        """
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def run(self):
+        while True:
+            if self.ponderState is not None and self.pondered < self.ponderLimit:
+                try:
+                    req = self.requests.get_nowait()
+                except queue.Empty:
+                    ## 对手思考时继续扩展搜索树
+                    self.searcher.Ponder(self.ponderState, self.ponderIterations)
+                    self.pondered += self.ponderIterations
+                    continue
+            else:
+                req = self.requests.get()
+
+            if req[0] == "quit":
+                return
+            elif req[0] == "play":
+                self.ponderHit = self.ponderState is not None and req[1] == self.searcher.Prediction()
+                self.ponderHits += self.ponderHit
+                self.ponderState = None
+                self.searcher.Play(req[1])
+            elif req[0] == "think":
+                state = req[1]
+                info = SearchInfo()
+                ## 猜中了对手的应手，树已经很大，只需少量补充搜索
+                timeout = self.hitTimeout if self.ponderHit else None
+                move = self.searcher.Search(state, info = info, timeout = timeout)
+                self.results.put((move, info, self.ponderHit))
+                self.ponderHit = False
+                self.searcher.Play(move)
+                state.DoMove(move)
+                self.ponderState = state if state.HasMoves() else None
+                self.pondered = 0
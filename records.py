@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+""" Compact binary game records, written in batches and read through mmap.
+
+    python arena.py "a:itermax=200" "b:itermax=400" --games 1000 --records games.grc
+    python records.py info games.grc               # number of games and results
+    python records.py show games.grc 12 --ply 20   # game 12, the board after 20 moves
+
+    A record file is
+
+        header      "GRC1", board size (uint16)
+        games       one after the other, each a fixed GAME header followed by its moves
+
+    The GAME header holds the number of moves (uint16), the final disc counts of black and
+    white (uint16 each), the random seed (uint32) and the settings of the black and then the
+    white player (PLAYER: itermax and timeout in ms, 0 for none (uint32 each), uctk (float32),
+    playouts (uint16), endgame empties, rollout as an index into ROLLOUTS and the FLAG_* bits
+    (uint8 each)). Every move is one byte, the square x*size+y; a pass is written as the square
+    of a starting disc (PassCode), which is never a legal move, so boards up to 16x16 fit.
+
+    Files are only ever appended to: RecordWriter collects encoded games and writes them
+    `batch` at a time. A file cut short by a crash loses only the incomplete last game, which
+    readers skip and a new RecordWriter cuts off before it appends (a partly written file
+    header is written again).
+    RecordReader maps the file and decodes games on demand; the offsets of the games are
+    collected the first time a game is asked for by number, by hopping from header to header,
+    so iterating reads the file once and random access costs 8 bytes per game of memory.
+"""
+import argparse
+import mmap
+import os
+import struct
+from array import array
+from UCT import *
+
+MAGIC = b"GRC1"
+FILE_HEADER = struct.Struct("<4sH")
+PLAYER_FORMAT = "IIfHBBB"
+GAME = struct.Struct("<HHHI" + PLAYER_FORMAT*2)
+
+ROLLOUTS = ("random", "batch", "pattern")
+ENGINES = ("list", "bitboard")
+FLAG_HEURISTICS = 1
+FLAG_BITBOARD = 2
+
+def PassCode(sz):
+    """ The byte standing for a pass on an sz x sz board: the square of the lower left starting disc.
+    """
+    return (sz//2 - 1)*sz + sz//2 - 1
+
+def EncodeMoves(moves, sz):
+    """ Moves ((x, y) or None for a pass) as bytes.
+    """
+    passcode = PassCode(sz)
+    return bytes(passcode if m is None else m[0]*sz + m[1] for m in moves)
+
+def DecodeMoves(data, sz):
+    """ The inverse of EncodeMoves.
+    """
+    passcode = PassCode(sz)
+    return [None if b == passcode else divmod(b, sz) for b in data]
+
+def _GameOffsets(data):
+    """ Yield the offset of every complete game in data (a file's bytes), then the end of the last one.
+    """
+    offset = FILE_HEADER.size
+    end = len(data)
+    while offset + GAME.size <= end:
+        n = struct.unpack_from("<H", data, offset)[0]
+        if offset + GAME.size + n > end: # cut short while being written
+            break
+        yield offset
+        offset += GAME.size + n
+    yield offset
+
+def _PackPlayer(settings):
+    """ Settings dict (the keys of arena.PLAYER_DEFAULTS, all optional) -> PLAYER fields.
+    """
+    s = settings or {}
+    flags = (FLAG_HEURISTICS if s.get("heuristics", True) else 0) | (FLAG_BITBOARD if s.get("engine") == "bitboard" else 0)
+    return (int(s.get("itermax") or 0), int(s.get("timeout") or 0), float(s.get("uctk", UCTK)),
+            int(s.get("playouts", 16)), int(s.get("endgame", ENDGAME_EMPTIES)),
+            ROLLOUTS.index(s.get("rollout", "random")), flags)
+
+def _UnpackPlayer(fields):
+    (itermax, timeout, uctk, playouts, endgame, rollout, flags) = fields
+    return {"itermax": itermax or None, "timeout": timeout or None, "uctk": uctk,
+            "playouts": playouts, "endgame": endgame, "rollout": ROLLOUTS[rollout],
+            "heuristics": bool(flags & FLAG_HEURISTICS), "engine": ENGINES[bool(flags & FLAG_BITBOARD)]}
+
+class GameRecord:
+    """ One decoded game: its number in the file, the moves (None for a pass), final disc
+        counts, seed and the settings of both players.
+    """
+    __slots__ = ("index", "size", "moves", "discs", "seed", "black", "white")
+
+    def __init__(self, index, size, moves, discs, seed = 0, black = None, white = None):
+        self.index = index
+        self.size = size
+        self.moves = moves
+        self.discs = discs
+        self.seed = seed
+        self.black = black
+        self.white = white
+
+    def Result(self, playerjm = 1):
+        """ 1.0, 0.5 or 0.0 from the viewpoint of playerjm, as GetResult.
+        """
+        (mine, theirs) = self.discs if playerjm == 1 else self.discs[::-1]
+        return 1.0 if mine > theirs else 0.0 if mine < theirs else 0.5
+
+    def State(self, ply = None, engine = "list"):
+        """ The position after the first `ply` moves (passes count as moves), by default the final one.
+        """
+        return Replay(self.moves, ply, self.size, engine)
+
+    def __repr__(self):
+        return "[game %d: %d moves, %d-%d]" % (self.index, len(self.moves), self.discs[0], self.discs[1])
+
+def Replay(moves, ply = None, sz = 8, engine = "list"):
+    """ Play moves (None for a pass) from the start, up to ply of them, and return the state.
+    """
+    state = MakeState(sz, engine)
+    for m in moves[:ply]:
+        if m is None:
+            state.playerJustMoved = 3 - state.playerJustMoved
+        else:
+            state.DoMove(m)
+    return state
+
+def Positions(moves, sz = 8, engine = "list"):
+    """ Yield (state, move) for every ply of a game, the state before the move is played.
+        The same state object is updated in place; Clone it to keep a position.
+    """
+    state = MakeState(sz, engine)
+    for m in moves:
+        yield (state, m)
+        if m is None:
+            state.playerJustMoved = 3 - state.playerJustMoved
+        else:
+            state.DoMove(m)
+
+class RecordWriter:
+    """ Appends games to a record file (creating it if needed), `batch` games per write.
+    """
+    def __init__(self, path, sz = 8, batch = 1024):
+        self.size = sz
+        self.batch = batch
+        self.pending = bytearray()
+        self.count = 0 # games in self.pending
+        header = FILE_HEADER.pack(MAGIC, sz)
+        self.file = open(path, "ab")
+        length = self.file.tell()
+        if 0 < length < FILE_HEADER.size:
+            ## 文件头本身没写完: 是本格式的开头就重写, 否则不是记录文件
+            with open(path, "rb") as f:
+                start = f.read()
+            if not header.startswith(start):
+                self.file.close()
+                raise ValueError("%s is not a record file for %dx%d games" % (path, sz, sz))
+            self.file.truncate(0)
+            self.file.seek(0)
+            length = 0
+        if length == 0:
+            self.file.write(header)
+        else:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            (magic, size) = FILE_HEADER.unpack_from(data, 0)
+            if magic != MAGIC or size != sz:
+                data.close()
+                self.file.close()
+                raise ValueError("%s is not a record file for %dx%d games" % (path, sz, sz))
+            ## 上次写到一半的对局丢掉, 新的对局接在最后一个完整对局之后
+            for end in _GameOffsets(data):
+                pass
+            length = len(data)
+            data.close()
+            if end < length:
+                self.file.truncate(end)
+                self.file.seek(end)
+
+    def Write(self, moves, discs, seed = 0, black = None, white = None):
+        """ Queue one game: its moves ((x, y) or None for a pass), the final disc counts
+            (black, white), the seed and the players' settings dicts.
+        """
+        self.pending += GAME.pack(len(moves), discs[0], discs[1], seed, *(_PackPlayer(black) + _PackPlayer(white)))
+        self.pending += EncodeMoves(moves, self.size)
+        self.count += 1
+        if self.count >= self.batch:
+            self.Flush()
+
+    def WriteState(self, moves, state, seed = 0, black = None, white = None):
+        """ Write, taking the disc counts from the final state.
+        """
+        board = state.board
+        self.Write(moves, [sum(col.count(p) for col in board) for p in (1, 2)], seed, black, white)
+
+    def Flush(self):
+        self.file.write(self.pending)
+        self.file.flush()
+        self.pending = bytearray()
+        self.count = 0
+
+    def Close(self):
+        self.Flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
+
+class RecordReader:
+    """ Read-only view of a record file: len(reader), reader[i] and iteration give GameRecords.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        (magic, self.size) = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a game record file" % path)
+        self.offsets = None
+
+    def _Walk(self):
+        """ Yield the offset of every complete game.
+        """
+        offsets = _GameOffsets(self.data)
+        offset = next(offsets)
+        for following in offsets:
+            yield offset
+            offset = following
+
+    def _Index(self):
+        if self.offsets is None:
+            self.offsets = array("Q", self._Walk())
+        return self.offsets
+
+    def _Decode(self, i, offset):
+        fields = GAME.unpack_from(self.data, offset)
+        start = offset + GAME.size
+        moves = DecodeMoves(self.data[start:start + fields[0]], self.size)
+        return GameRecord(i, self.size, moves, (fields[1], fields[2]), fields[3],
+                          _UnpackPlayer(fields[4:11]), _UnpackPlayer(fields[11:18]))
+
+    def __len__(self):
+        return len(self._Index())
+
+    def __getitem__(self, i):
+        offsets = self._Index()
+        if i < 0:
+            i += len(offsets)
+        if not 0 <= i < len(offsets):
+            raise IndexError("game %d out of range" % i)
+        return self._Decode(i, offsets[i])
+
+    def __iter__(self):
+        for (i, offset) in enumerate(self._Walk()):
+            yield self._Decode(i, offset)
+
+    def Close(self):
+        self.data.close()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Inspect a game record file")
+    parser.add_argument("command", choices = ("info", "show"))
+    parser.add_argument("path")
+    parser.add_argument("game", type = int, nargs = "?", default = 0)
+    parser.add_argument("--ply", type = int, default = None, help = "show the board after this many moves")
+    args = parser.parse_args(argv)
+    reader = RecordReader(args.path)
+    if args.command == "info":
+        results = {1.0: 0, 0.5: 0, 0.0: 0}
+        plies = 0
+        for r in reader:
+            results[r.Result(1)] += 1
+            plies += len(r.moves)
+        games = sum(results.values())
+        print("%d games on %dx%d, %d bytes, %.1f moves/game" % (games, reader.size, reader.size,
+              os.path.getsize(args.path), plies / max(1, games)))
+        print("black +%d =%d -%d" % (results[1.0], results[0.5], results[0.0]))
+    else:
+        r = reader[args.game]
+        print(r, "seed", r.seed)
+        print("black", r.black)
+        print("white", r.white)
+        print(r.State(args.ply))
+    reader.Close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+""" Headless engine server.
+
+    python server.py                     # one game over stdin/stdout
+    python server.py --tcp 7777          # one game per TCP connection, many at once
+
+    Text protocol, one command per line; every reply is "= <result>" or "? <error>"
+    followed by an empty line:
+
+        new [size]          start a new game (default size 8, even sizes from MIN_SIZE to
+                            MAX_SIZE), black (player 1) to move
+        play <move>         play a move for the side to move, e.g. "play d3"
+        pass                the side to move passes (only when it has no legal move)
+        genmove [ms]        search for the side to move for at most ms milliseconds
+                            (default DEFAULT_MS, longer budgets are cut to MAX_MS),
+                            play the move and reply with it ("pass" if there is none)
+        moves               legal moves of the side to move
+        board               the position, one row per line, row 1 first
+        quit                end the session
+
+    Moves are a column letter and a row number as in the GUI: "a1" is the top-left
+    square, i.e. board square (0, size-1).
+
+    Searches run in a bounded process pool, so the event loop keeps serving other
+    sessions while they think.
+"""
+import argparse
+import asyncio
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from UCT import *
+
+DEFAULT_MS = 1000
+MAX_MS = 60000
+MIN_SIZE = 4
+MAX_SIZE = 16
+
+def MoveToText(move, sz):
+    return "%s%d" % (chr(ord("a") + move[0]), sz - move[1])
+
+def TextToMove(text, sz):
+    """ Parse "d3" into board coordinates, or raise ValueError.
+    """
+    text = text.strip().lower()
+    (x, y) = (ord(text[0]) - ord("a"), sz - int(text[1:]))
+    if not (0 <= x < sz and 0 <= y < sz):
+        raise ValueError(text)
+    return (x, y)
+
+def _GenMove(state, ms, options):
+    """ Run in a pool process: search state for at most ms milliseconds and return the move.
+    """
+    return UCT(state, None, timeout = ms, **options)
+
+class Session:
+    """ One game driven through the text protocol.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.state = MakeState(engine = server.engine)
+
+    async def Handle(self, line):
+        """ Execute one command line and return the reply (None to close the session).
+        """
+        words = line.split()
+        if not words:
+            return ""
+        (cmd, args) = (words[0].lower(), words[1:])
+        sz = self.state.size
+        try:
+            if cmd == "quit":
+                return None
+            elif cmd == "new":
+                size = int(args[0]) if args else 8
+                if size % 2 or not MIN_SIZE <= size <= MAX_SIZE:
+                    return "? bad size"
+                self.state = MakeState(size, self.server.engine)
+                return "= ok"
+            elif cmd == "play":
+                move = TextToMove(args[0], sz)
+                if move not in self.state.GetMoves():
+                    return "? illegal move"
+                self.state.DoMove(move)
+                return "= ok"
+            elif cmd == "pass":
+                if self.state.HasMoves():
+                    return "? illegal pass"
+                self.state.playerJustMoved = 3 - self.state.playerJustMoved
+                return "= ok"
+            elif cmd == "genmove":
+                if not self.state.HasMoves():
+                    self.state.playerJustMoved = 3 - self.state.playerJustMoved
+                    return "= pass"
+                ms = float(args[0]) if args else DEFAULT_MS
+                if not 0 < ms < float("inf"): # also false for nan
+                    return "? bad time"
+                ms = min(ms, MAX_MS)
+                move = await self.server.Search(self.state, ms)
+                self.state.DoMove(move)
+                return "= " + MoveToText(move, sz)
+            elif cmd == "moves":
+                return "= " + " ".join(MoveToText(m, sz) for m in self.state.GetMoves())
+            elif cmd == "board":
+                return "= \n" + str(self.state).rstrip("\n")
+            else:
+                return "? unknown command"
+        except (ValueError, IndexError):
+            return "? syntax error"
+
+class EngineServer:
+    """ Serves sessions and runs their searches in a pool of `workers` processes.
+        At most `maxpending` searches wait for the pool at once; more requests queue here.
+    """
+    def __init__(self, workers = None, engine = "bitboard", maxpending = 64, **options):
+        self.pool = ProcessPoolExecutor(max_workers = workers)
+        self.pending = None # asyncio.Semaphore, created inside the running loop
+        self.maxpending = maxpending
+        self.engine = engine
+        self.options = options # passed to UCT()
+
+    async def Search(self, state, ms):
+        if self.pending is None:
+            self.pending = asyncio.Semaphore(self.maxpending)
+        async with self.pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, _GenMove, state, ms, self.options)
+
+    async def Serve(self, reader, writer):
+        """ Run one session over a stream pair until quit or EOF.
+        """
+        session = Session(self)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await session.Handle(line.decode("utf-8", "replace"))
+                if reply is None:
+                    writer.write(b"= bye\n\n")
+                    await writer.drain()
+                    break
+                if reply:
+                    writer.write((reply + "\n\n").encode("utf-8"))
+                    await writer.drain()
+        finally:
+            writer.close()
+
+    async def ServeStdio(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        session = Session(self)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            reply = await session.Handle(line.decode("utf-8", "replace"))
+            if reply is None:
+                break
+            if reply:
+                sys.stdout.write(reply + "\n\n")
+                sys.stdout.flush()
+
+    async def ServeTCP(self, host, port):
+        server = await asyncio.start_server(self.Serve, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def Close(self):
+        self.pool.shutdown()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Headless Othello engine server")
+    parser.add_argument("--tcp", type = int, metavar = "PORT", help = "listen on this TCP port instead of stdin/stdout")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--workers", type = int, default = None, help = "search processes (default: cpu count)")
+    parser.add_argument("--engine", default = "bitboard", choices = sorted(STATE_ENGINES))
+    parser.add_argument("--maxnodes", type = int, default = None, help = "tree size limit per search (default: none)")
+    args = parser.parse_args(argv)
+    server = EngineServer(workers = args.workers, engine = args.engine, maxnodes = args.maxnodes)
+    try:
+        if args.tcp is not None:
+            asyncio.run(server.ServeTCP(args.host, args.tcp))
+        else:
+            asyncio.run(server.ServeStdio())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.Close()
+
+if __name__ == "__main__":
+    main()